@@ -1,115 +1,249 @@
 import gc                      # Garbage collection
+import sys                     # Command line flags
 import time                    # Time functions
 import asyncio                 # Asynchronous I/O
 import traceback               # Exception handling
 import threading               # Thread management
+import os                      # Environment variables
 
-from src.core.polymarket_client import PolymarketClient
-from src.data.data_utils import update_markets, update_positions, update_orders
-from src.data.websocket_handlers import connect_market_websocket, connect_user_websocket
-import src.core.global_state as global_state
-from src.data.data_processing import remove_from_performing
+from src.utils.profiling import timed, mark, print_startup_report
+
+# Heavy third-party imports, timed for --profile-startup
+with timed('import pandas'):
+    import pandas
+with timed('import py_clob_client'):
+    import py_clob_client.client
+
+with timed('import modules'):
+    from src.core.polymarket_client import PolymarketClient
+    from src.data.data_utils import update_positions, update_orders
+    from src.data.market_config import update_markets
+    from src.data.websocket_handlers import connect_market_websocket, connect_user_websocket
+    import src.core.global_state as global_state
+    from src.data.data_processing import schedule_pending_expiry
+    from src.data.reconciliation import reconcile_if_due
+    from src.core.checkpoint import load_checkpoint, restore_checkpoint, build_checkpoint, encode_checkpoint, write_checkpoint, CHECKPOINT_INTERVAL
+    from src.trading.trade_scheduler import request_trade, print_lane_stats
+    from src.utils.memory import print_memory_report, REPORT_INTERVAL
+    from src.core.control import check_kill_file, install_signal_handlers, serve_control_socket
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def update_once():
+PROFILE_STARTUP = '--profile-startup' in sys.argv
+MEMORY_REPORT = '--memory-report' in sys.argv
+
+# Seconds between trade lane latency reports
+LANE_REPORT_INTERVAL = 5 * 60
+
+# Young-generation collections run every GC_THRESHOLD[0] allocations. The
+# default of 700 means a collection every few book updates; per-market state
+# is evicted explicitly, so the cyclic collector only has to catch stragglers.
+GC_THRESHOLD = (50_000, 20, 100)
+
+# Seconds before retrying a failed warm start reconcile, doubling per failure
+WARM_START_RETRY = 5
+WARM_START_MAX_RETRY = 60
+
+def update_periodically():
     """
-    Initialize the application state by fetching market data, positions, and orders.
+    Background thread function that keeps local state in sync with the API.
+    - Positions and orders are reconciled over REST on an adaptive schedule:
+      every few seconds after fills or disconnects, backing off when quiet
+    - Market config is checked every second and applied as soon as it changes
+    - The kill file (state/KILL) is checked every second
+
+    Stale pending trades are expired on the event loop by timers set in
+    add_to_performing.
     """
-    update_markets()    # Get market information from JSON config
-    update_positions()  # Get current positions from Polymarket
-    update_orders()     # Get current orders from Polymarket
+    while True:
+        time.sleep(1)
 
-def remove_from_pending():
+        # Each step has its own try so a REST failure doesn't skip the
+        # kill file or the config reload
+        for step in (
+            check_kill_file,    # Operator kill switch
+            reconcile_if_due,   # Check positions and orders against the API when due
+            update_markets,     # Pick up edits to markets.json / params.json
+        ):
+            try:
+                step()
+            except:
+                print(f"Error in update_periodically ({step.__name__})")
+                print(traceback.format_exc())
+            
+async def reconcile_after_warm_start():
     """
-    Clean up stale trades that have been pending for too long (>15 seconds).
-    This prevents the system from getting stuck on trades that may have failed.
+    Pull positions and orders from the API after starting from a checkpoint,
+    then leave guarded mode. Stays guarded and retries until it succeeds, so
+    merges and stop-losses never act on unverified checkpoint positions.
     """
-    try:
-        current_time = time.time()
-            
-        # Iterate through all performing trades
-        for col in list(global_state.performing.keys()):
-            for trade_id in list(global_state.performing[col]):
-                
-                try:
-                    # If trade has been pending for more than 15 seconds, remove it
-                    if current_time - global_state.performing_timestamps[col].get(trade_id, current_time) > 15:
-                        print(f"Removing stale entry {trade_id} from {col} after 15 seconds")
-                        remove_from_performing(col, trade_id)
-                        print("After removing: ", global_state.performing, global_state.performing_timestamps)
-                except:
-                    print("Error in remove_from_pending")
-                    print(traceback.format_exc())                
-    except:
-        print("Error in remove_from_pending")
-        print(traceback.format_exc())
+    delay = WARM_START_RETRY
+    while True:
+        try:
+            await asyncio.to_thread(update_positions)
+            await asyncio.to_thread(update_orders)
+            break
+        except:
+            print(f"Error reconciling after warm start, staying guarded and retrying in {delay}s")
+            print(traceback.format_exc())
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARM_START_MAX_RETRY)
 
-def update_periodically():
+    global_state.guarded = False
+    print(f"Reconciled after warm start: {len(global_state.positions)} positions and {len(global_state.orders)} orders")
+
+async def checkpoint_periodically():
     """
-    Background thread function that periodically updates market data, positions and orders.
-    - Positions and orders are updated every 5 seconds
-    - Market data is updated every 30 seconds (every 6 cycles)
-    - Stale pending trades are removed each cycle
+    Save runtime state every few seconds so a restart can resume quickly.
     """
-    i = 1
     while True:
-        time.sleep(5)  # Update every 5 seconds
-        
+        await asyncio.sleep(CHECKPOINT_INTERVAL)
         try:
-            # Clean up stale trades
-            remove_from_pending()
-            
-            # Update positions and orders every cycle
-            update_positions(avgOnly=True)  # Only update average price, not position size
-            update_orders()
-
-            # Update market data every 6th cycle (30 seconds)
-            if i % 6 == 0:
-                update_markets()
-                i = 1
-                    
-            gc.collect()  # Force garbage collection to free memory
-            i += 1
+            payload = encode_checkpoint(build_checkpoint())
+            await asyncio.to_thread(write_checkpoint, payload)
         except:
-            print("Error in update_periodically")
+            print("Error writing checkpoint")
             print(traceback.format_exc())
-            
+
+async def timed_in_thread(name, func, *args):
+    with timed(name):
+        return await asyncio.to_thread(func, *args)
+
+async def cold_start():
+    """
+    Initialize the client, positions and orders concurrently. Positions are
+    public and only need the wallet address, so they load while API
+    credentials are derived; orders follow once credentials are ready.
+    """
+    with timed('client'):
+        global_state.client = PolymarketClient(defer_creds=True)
+
+    async def creds_then_orders():
+        await timed_in_thread('derive creds', global_state.client.setup_creds)
+        await timed_in_thread('fetch orders', update_orders)
+
+    await asyncio.gather(
+        timed_in_thread('fetch positions', update_positions),
+        creds_then_orders()
+    )
+
+async def start_trading():
+    """
+    Allow book updates to trigger trading and quote every market whose book
+    already arrived while we were starting up.
+    """
+    global_state.ready = True
+    mark('ready to quote')
+
+    for market in list(global_state.all_data.keys()):
+        if market in global_state.markets:
+            request_trade(market, 'book')
+
+    if PROFILE_STARTUP:
+        print_startup_report()
+
+async def run_market_websocket():
+    # Market data needs no credentials, so it can connect as soon as the
+    # token list is known
+    while True:
+        try:
+            await connect_market_websocket(global_state.all_tokens)
+            print("Reconnecting to the market websocket")
+        except:
+            print("Error in market websocket loop")
+            print(traceback.format_exc())
+
+        await asyncio.sleep(1)
+
+async def run_user_websocket():
+    while True:
+        try:
+            await connect_user_websocket()
+            print("Reconnecting to the user websocket")
+        except:
+            print("Error in user websocket loop")
+            print(traceback.format_exc())
+
+        await asyncio.sleep(1)
+
+def tune_gc():
+    """
+    Move everything loaded at startup (modules, config, restored state) out
+    of the collector's reach and make young collections less frequent.
+    """
+    gc.collect()
+    gc.freeze()
+    gc.set_threshold(*GC_THRESHOLD)
+    print(f"Froze {gc.get_freeze_count()} startup objects")
+
+async def report_lanes_periodically():
+    while True:
+        await asyncio.sleep(LANE_REPORT_INTERVAL)
+        print_lane_stats()
+
+async def report_memory_periodically():
+    while True:
+        try:
+            print_memory_report()
+        except:
+            print("Error in memory report")
+            print(traceback.format_exc())
+        await asyncio.sleep(REPORT_INTERVAL)
+
 async def main():
     """
     Main application entry point. Initializes client, data, and manages websocket connections.
     """
-    # Initialize client
-    global_state.client = PolymarketClient()
-    
-    # Initialize state and fetch initial data
-    global_state.all_tokens = []
-    update_once()
-    print("After initial updates: ", global_state.orders, global_state.positions)
+    global_state.loop = asyncio.get_running_loop()
+
+    with timed('load market config'):
+        update_markets()    # Get market information from JSON config
+
+    market_task = asyncio.create_task(run_market_websocket())
+
+    checkpoint = load_checkpoint(os.getenv("BROWSER_ADDRESS", ""))
+
+    if checkpoint is not None:
+        # Warm start: quote from the checkpoint straight away in guarded mode
+        # and reconcile with the API in the background
+        with timed('restore checkpoint'):
+            global_state.client = PolymarketClient(creds=checkpoint['creds'])
+            restore_checkpoint(checkpoint)
+            schedule_pending_expiry()
+            global_state.guarded = True
+
+        asyncio.create_task(reconcile_after_warm_start())
+    else:
+        await cold_start()
+        print("After initial updates: ", global_state.orders, global_state.positions)
 
     print("\n")
-    print(f'There are {len(global_state.df)} market, {len(global_state.positions)} positions and {len(global_state.orders)} orders. Starting positions: {global_state.positions}')
+    print(f'There are {len(global_state.markets)} market, {len(global_state.positions)} positions and {len(global_state.orders)} orders. Starting positions: {global_state.positions}')
+
+    user_task = asyncio.create_task(run_user_websocket())
+
+    # Operator controls are live before the first quote, and a kill file
+    # left from before the restart keeps the bot halted
+    install_signal_handlers()
+    asyncio.create_task(serve_control_socket())
+    check_kill_file()
+
+    await start_trading()
+    tune_gc()
+    asyncio.create_task(report_lanes_periodically())
+
+    if MEMORY_REPORT:
+        asyncio.create_task(report_memory_periodically())
+
+    asyncio.create_task(checkpoint_periodically())
 
     # Start background update thread
     update_thread = threading.Thread(target=update_periodically, daemon=True)
     update_thread.start()
     
-    # Main loop - maintain websocket connections
-    while True:
-        try:
-            # Connect to market and user websockets simultaneously
-            await asyncio.gather(
-                connect_market_websocket(global_state.all_tokens), 
-                connect_user_websocket()
-            )
-            print("Reconnecting to the websocket")
-        except:
-            print("Error in main loop")
-            print(traceback.format_exc())
-            
-        await asyncio.sleep(1)
-        gc.collect()  # Clean up memory
+    # Keep both websocket connections running
+    await asyncio.gather(market_task, user_task)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
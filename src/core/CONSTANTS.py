@@ -1,3 +1,10 @@
 # Minimum position size to trigger position merging
 # Positions smaller than this will be ignored to save on gas costs
-MIN_MERGE_SIZE = 20
\ No newline at end of file
+MIN_MERGE_SIZE = 20
+
+# Portfolio risk limits in USDC (position cost plus open buy orders).
+# New buy orders that would take an aggregate past its limit are rejected.
+# Defaults for the "risk" section of params.json.
+MAX_MARKET_EXPOSURE = 500     # Both outcomes of one market
+MAX_GROUP_EXPOSURE = 1500     # All markets of one neg-risk event or series
+MAX_ACCOUNT_EXPOSURE = 10000  # Everything
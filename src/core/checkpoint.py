@@ -0,0 +1,153 @@
+import gzip
+import json
+import os
+import time
+
+from sortedcontainers import SortedDict
+
+import src.core.global_state as global_state
+from src.core.models import Position, TokenOrders
+from src.trading.risk_engine import rebuild as rebuild_exposure
+
+# Periodic checkpoints of the runtime state so a restarted bot can start
+# quoting straight away and reconcile with the API in the background.
+
+CHECKPOINT_DIR = 'state'
+CHECKPOINT_FILE = os.path.join(CHECKPOINT_DIR, 'checkpoint.json.gz')
+
+# Seconds between checkpoints
+CHECKPOINT_INTERVAL = 10
+
+# Checkpoints older than this are ignored and the bot cold-starts
+MAX_CHECKPOINT_AGE = 15 * 60
+
+# Restored books older than this are not quoted from until the websocket
+# sends a fresh snapshot
+MAX_BOOK_AGE = 30
+
+# Price levels kept per side of each book
+BOOK_DEPTH = 50
+
+CHECKPOINT_VERSION = 1
+
+
+def build_checkpoint():
+    """
+    Snapshot the runtime state. Must run on the event loop, which is the only
+    writer of these structures, so the copy is consistent.
+
+    Returns:
+        dict: JSON-serialisable checkpoint
+    """
+    books = {}
+    for market, book in global_state.all_data.items():
+        books[market] = {
+            'asset_id': book['asset_id'],
+            'bids': [list(level) for level in book['bids'].items()[-BOOK_DEPTH:]],
+            'asks': [list(level) for level in book['asks'].items()[:BOOK_DEPTH]],
+        }
+
+    creds = None
+    client = global_state.client
+    if client is not None and getattr(client, 'creds', None) is not None:
+        creds = {
+            'api_key': client.creds.api_key,
+            'api_secret': client.creds.api_secret,
+            'api_passphrase': client.creds.api_passphrase,
+        }
+
+    return {
+        'version': CHECKPOINT_VERSION,
+        'saved_at': time.time(),
+        'wallet': client.browser_wallet.lower() if client is not None else None,
+        'creds': creds,
+        'positions': {token: position.to_dict() for token, position in global_state.positions.items()},
+        'orders': {token: token_orders.to_dict() for token, token_orders in global_state.orders.items()},
+        'performing': {col: list(ids) for col, ids in global_state.performing.items() if ids},
+        'performing_timestamps': {col: dict(ts) for col, ts in global_state.performing_timestamps.items() if ts},
+        'last_trade_update': dict(global_state.last_trade_update),
+        'books': books,
+    }
+
+
+def encode_checkpoint(checkpoint):
+    # Serialise on the event loop so nothing changes underneath json.dumps
+    return json.dumps(checkpoint, separators=(',', ':')).encode()
+
+
+def write_checkpoint(payload):
+    """
+    Compress and write an encoded checkpoint atomically. Blocking, run it off
+    the event loop. The file holds API credentials, so it is only readable by
+    the owner.
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    tmp_path = CHECKPOINT_FILE + '.tmp'
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(gzip.compress(payload, compresslevel=1))
+
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+
+def load_checkpoint(wallet, max_age=MAX_CHECKPOINT_AGE):
+    """
+    Load the last checkpoint if it is recent and belongs to this wallet.
+
+    Args:
+        wallet (str): Browser wallet address the bot trades for
+        max_age (float, optional): Maximum checkpoint age in seconds
+
+    Returns:
+        dict or None: The checkpoint, or None to cold-start
+    """
+    try:
+        with open(CHECKPOINT_FILE, 'rb') as f:
+            checkpoint = json.loads(gzip.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except Exception as ex:
+        print(f"Ignoring unreadable checkpoint: {ex}")
+        return None
+
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('wallet') != wallet.lower():
+        return None
+
+    age = time.time() - checkpoint['saved_at']
+    if age > max_age:
+        print(f"Checkpoint is {age:.0f}s old, cold-starting")
+        return None
+
+    return checkpoint
+
+
+def restore_checkpoint(checkpoint):
+    """
+    Load checkpointed state into global_state. Books are only restored when
+    they are recent enough to quote from.
+    """
+    global_state.positions.update({token: Position.from_dict(position) for token, position in checkpoint['positions'].items()})
+    global_state.orders.update({token: TokenOrders.from_dict(token_orders) for token, token_orders in checkpoint['orders'].items()})
+    global_state.last_trade_update.update(checkpoint['last_trade_update'])
+
+    for col, ids in checkpoint['performing'].items():
+        global_state.performing.setdefault(col, set()).update(ids)
+
+    for col, timestamps in checkpoint['performing_timestamps'].items():
+        global_state.performing_timestamps.setdefault(col, {}).update(timestamps)
+
+    rebuild_exposure()
+
+    age = time.time() - checkpoint['saved_at']
+    books = checkpoint['books'] if age <= MAX_BOOK_AGE else {}
+
+    for market, book in books.items():
+        global_state.all_data[market] = {
+            'asset_id': book['asset_id'],
+            'bids': SortedDict({price: size for price, size in book['bids']}),
+            'asks': SortedDict({price: size for price, size in book['asks']}),
+        }
+
+    print(f"Restored checkpoint from {age:.1f}s ago: {len(checkpoint['positions'])} positions, "
+          f"{len(checkpoint['orders'])} orders, {len(books)} books")
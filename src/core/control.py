@@ -0,0 +1,133 @@
+import asyncio
+import os
+import signal
+
+import src.core.global_state as global_state
+import src.trading.order_gateway as order_gateway
+from src.trading.trade_scheduler import request_trade
+
+# Operator control of the running bot: the kill switch and resuming after it.
+#
+#   kill     SIGUSR1, creating state/KILL (its contents are used as the
+#            reason), or "kill [reason]" on the control socket
+#   resume   SIGUSR2 or "resume" on the control socket. Refused while
+#            state/KILL exists, so a kill file also halts a restarted bot.
+#   status   "status" on the control socket
+#
+# The control socket is a Unix socket at state/control.sock, readable by the
+# owner only:  echo "kill spread blowout" | nc -U state/control.sock
+
+CONTROL_DIR = 'state'
+KILL_FILE = os.path.join(CONTROL_DIR, 'KILL')
+CONTROL_SOCKET = os.path.join(CONTROL_DIR, 'control.sock')
+
+
+def kill(reason):
+    order_gateway.kill_switch(reason)
+
+
+def resume(source):
+    """
+    Resume quoting after a kill. Must run on the event loop.
+
+    Returns:
+        str: What happened, for the operator
+    """
+    if os.path.exists(KILL_FILE):
+        return f"not resuming: remove {KILL_FILE} first"
+    if not order_gateway.halted:
+        return "not halted"
+
+    order_gateway.resume_trading()
+    print(f"Trading resumed by {source}")
+
+    # Quote every market again without waiting for its next book update
+    for market in list(global_state.markets):
+        request_trade(market, 'risk')
+    return "resumed"
+
+
+def status():
+    if not order_gateway.halted:
+        state = "trading"
+    else:
+        state = f"halted: {order_gateway.halt_reason}"
+
+    flatten = order_gateway.last_flatten
+    if flatten:
+        outcome = 'flat' if flatten['flat'] else 'NOT verified flat'
+        state += (f"\nlast kill ({flatten['reason']}): {outcome} after {flatten['seconds']:.2f}s, "
+                  f"{flatten['attempts']} checks")
+    return state
+
+
+def check_kill_file():
+    """
+    Trigger the kill switch if state/KILL exists. Cheap enough to call every
+    second from the background thread.
+    """
+    if order_gateway.halted or not os.path.exists(KILL_FILE):
+        return
+
+    try:
+        with open(KILL_FILE) as f:
+            reason = f.read().strip()
+    except OSError:
+        reason = ''
+    kill(f"kill file: {reason}" if reason else "kill file")
+
+
+def install_signal_handlers():
+    """
+    SIGUSR1 kills, SIGUSR2 resumes. Must run on the event loop. Not
+    available on Windows.
+    """
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGUSR1, kill, 'SIGUSR1')
+    loop.add_signal_handler(signal.SIGUSR2, lambda: print(resume('SIGUSR2')))
+
+
+async def handle_command(reader, writer):
+    try:
+        line = (await reader.readline()).decode().strip()
+        command, _, argument = line.partition(' ')
+        command = command.lower()
+
+        if command == 'kill':
+            kill(f"control socket: {argument}" if argument else "control socket")
+            reply = "halted, cancelling all orders"
+        elif command == 'resume':
+            reply = resume('control socket')
+        elif command == 'status':
+            reply = status()
+        else:
+            reply = "commands: kill [reason], resume, status"
+
+        writer.write((reply + '\n').encode())
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve_control_socket():
+    """
+    Accept operator commands on the control socket. Not available on Windows.
+    """
+    if not hasattr(asyncio, 'start_unix_server'):
+        return
+
+    os.makedirs(CONTROL_DIR, exist_ok=True)
+    try:
+        os.unlink(CONTROL_SOCKET)
+    except FileNotFoundError:
+        pass
+
+    server = await asyncio.start_unix_server(handle_command, path=CONTROL_SOCKET)
+    os.chmod(CONTROL_SOCKET, 0o600)
+    print(f"Control socket listening on {CONTROL_SOCKET}")
+
+    async with server:
+        await server.serve_forever()
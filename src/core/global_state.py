@@ -3,9 +3,12 @@ import pandas as pd
 
 # ============ Market Data ============
 
-# List of all tokens being tracked
+# List of all tokens being tracked (subscription order)
 all_tokens = []
 
+# Same tokens as a set for O(1) membership checks
+all_tokens_set = set()
+
 # Mapping between tokens in the same market (YES->NO, NO->YES)
 REVERSE_TOKENS = {}  
 
@@ -15,6 +18,12 @@ all_data = {}
 # Market configuration data from JSON config
 df = None  
 
+# Market configuration rows keyed by condition_id
+markets = {}
+
+# Open market websocket, used to subscribe to new tokens without reconnecting
+market_websocket = None
+
 # ============ Client & Parameters ============
 
 # Polymarket client instance
@@ -26,6 +35,9 @@ params = {}
 # Lock for thread-safe trading operations
 lock = threading.Lock()
 
+# Event loop running the websockets and trading, set once main() starts
+loop = None
+
 # ============ Trading State ============
 
 # Tracks trades that have been matched but not yet mined
@@ -40,10 +52,18 @@ performing_timestamps = {}
 last_trade_update = {}
 
 # Current open orders for each token
-# Format: {token_id: {'buy': {price, size}, 'sell': {price, size}}}
+# Format: {token_id: TokenOrders}, see src/core/models.py
 orders = {}
 
+# Set once positions and orders are loaded. Book updates only trigger
+# trading after this.
+ready = False
+
+# True while quoting from a restored checkpoint, until the first full
+# reconciliation with the API completes. Merges and stop-loss exits wait.
+guarded = False
+
 # Current positions for each token
-# Format: {token_id: {'size': float, 'avgPrice': float}}
+# Format: {token_id: Position}, see src/core/models.py
 positions = {}
 
@@ -3,15 +3,12 @@ import os                           # Operating system interface
 
 # Polymarket API client libraries
 from py_clob_client.client import ClobClient
-from py_clob_client.clob_types import OrderArgs, BalanceAllowanceParams, AssetType, PartialCreateOrderOptions, OrderType
+from py_clob_client.clob_types import OrderArgs, BalanceAllowanceParams, AssetType, PartialCreateOrderOptions, OrderType, ApiCreds
 from py_clob_client.constants import POLYGON
 
-# Web3 libraries for blockchain interaction
-from web3 import Web3
-from web3.middleware import ExtraDataToPOAMiddleware
-from eth_account import Account
+# Web3 is imported lazily on first on-chain call, see PolymarketClient.web3
+from eth_utils import to_checksum_address
 
-import requests                     # HTTP requests
 import pandas as pd                 # Data analysis
 import json                         # JSON processing
 import subprocess                   # For calling external processes
@@ -19,7 +16,9 @@ import subprocess                   # For calling external processes
 from py_clob_client.clob_types import OpenOrderParams
 
 # Smart contract ABIs
-from src.utils.abis import NegRiskAdapterABI, ConditionalTokenABI, erc20_abi
+from src.utils.abis import NegRiskAdapterABI, ConditionalTokenABI, erc20_abi, Multicall3ABI
+from src.utils.profiling import timed
+from src.utils import http          # Pooled HTTP sessions
 
 # Load environment variables
 load_dotenv()
@@ -38,12 +37,20 @@ class PolymarketClient:
     The client connects to both the Polymarket API and the Polygon blockchain.
     """
     
-    def __init__(self, pk='default') -> None:
+    def __init__(self, pk='default', creds=None, defer_creds=False) -> None:
         """
-        Initialize the Polymarket client with API and blockchain connections.
+        Initialize the Polymarket client.
+
+        Only the CLOB API client is set up here. The Web3 connection and
+        contract objects are created on first use (merges and balance checks),
+        which keeps them off the startup path.
         
         Args:
             pk (str, optional): Private key identifier, defaults to 'default'
+            creds (dict, optional): Cached API credentials (api_key, api_secret,
+                api_passphrase). Skips the derivation round trip when given.
+            defer_creds (bool, optional): Don't set up API credentials yet; call
+                setup_creds() before any authenticated request
         """
         host="https://clob.polymarket.com"
 
@@ -54,7 +61,7 @@ class PolymarketClient:
         # Don't print sensitive wallet information
         print("Initializing Polymarket client...")
         chain_id=POLYGON
-        self.browser_wallet=Web3.to_checksum_address(browser_address)
+        self.browser_wallet=to_checksum_address(browser_address)
 
         # Initialize the Polymarket API client
         self.client = ClobClient(
@@ -65,39 +72,94 @@ class PolymarketClient:
             signature_type=2
         )
 
-        # Set up API credentials
-        self.creds = self.client.create_or_derive_api_creds()
-        self.client.set_api_creds(creds=self.creds)
-        
-        # Initialize Web3 connection to Polygon
-        web3 = Web3(Web3.HTTPProvider("https://polygon-rpc.com"))
-        web3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
-        
-        # Set up USDC contract for balance checks
-        self.usdc_contract = web3.eth.contract(
-            address="0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174", 
-            abi=erc20_abi
-        )
-
         # Store key contract addresses
         self.addresses = {
             'neg_risk_adapter': '0xd91E80cF2E7be2e162c6513ceD06f1dD0dA35296',
             'collateral': '0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174',
-            'conditional_tokens': '0x4D97DCd97eC945f40cF65F87097ACe5EA0476045'
+            'conditional_tokens': '0x4D97DCd97eC945f40cF65F87097ACe5EA0476045',
+            'multicall3': '0xcA11bde05977b3631167028862bE2a173976CA11'
         }
 
-        # Initialize contract interfaces
-        self.neg_risk_adapter = web3.eth.contract(
-            address=self.addresses['neg_risk_adapter'], 
-            abi=NegRiskAdapterABI
-        )
+        self.creds = None
+        self._web3 = None
 
-        self.conditional_tokens = web3.eth.contract(
-            address=self.addresses['conditional_tokens'], 
-            abi=ConditionalTokenABI
-        )
+        if creds is not None or not defer_creds:
+            self.setup_creds(creds)
 
-        self.web3 = web3
+    def setup_creds(self, creds=None):
+        """
+        Set up API credentials, deriving them from the private key unless
+        cached credentials are given.
+        
+        Args:
+            creds (dict, optional): Cached API credentials
+        """
+        with timed('api creds'):
+            if creds is not None:
+                self.creds = ApiCreds(**creds)
+            else:
+                self.creds = self.client.create_or_derive_api_creds()
+            self.client.set_api_creds(creds=self.creds)
+
+    @property
+    def web3(self):
+        """
+        Web3 connection to Polygon and contract interfaces, created on first use.
+        """
+        if self._web3 is None:
+            with timed('web3 setup'):
+                from web3 import Web3
+                from web3.middleware import ExtraDataToPOAMiddleware
+
+                # Initialize Web3 connection to Polygon
+                web3 = Web3(Web3.HTTPProvider("https://polygon-rpc.com"))
+                web3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+
+                # Set up USDC contract for balance checks
+                self._usdc_contract = web3.eth.contract(
+                    address=self.addresses['collateral'], 
+                    abi=erc20_abi
+                )
+
+                # Initialize contract interfaces
+                self._neg_risk_adapter = web3.eth.contract(
+                    address=self.addresses['neg_risk_adapter'], 
+                    abi=NegRiskAdapterABI
+                )
+
+                self._conditional_tokens = web3.eth.contract(
+                    address=self.addresses['conditional_tokens'], 
+                    abi=ConditionalTokenABI
+                )
+
+                self._multicall = web3.eth.contract(
+                    address=self.addresses['multicall3'],
+                    abi=Multicall3ABI
+                )
+
+                self._web3 = web3
+
+        return self._web3
+
+    @property
+    def usdc_contract(self):
+        self.web3
+        return self._usdc_contract
+
+    @property
+    def neg_risk_adapter(self):
+        self.web3
+        return self._neg_risk_adapter
+
+    @property
+    def conditional_tokens(self):
+        self.web3
+        return self._conditional_tokens
+
+    @property
+    def multicall(self):
+        self.web3
+        return self._multicall
 
     
     def create_order(self, marketId, action, price, size, neg_risk=False):
@@ -168,7 +230,7 @@ class PolymarketClient:
         Returns:
             float: Total position value in USDC
         """
-        res = requests.get(f'https://data-api.polymarket.com/value?user={self.browser_wallet}')
+        res = http.get(f'https://data-api.polymarket.com/value?user={self.browser_wallet}')
         return float(res.json()['value'])
 
     def get_total_balance(self):
@@ -187,7 +249,7 @@ class PolymarketClient:
         Returns:
             DataFrame: All positions with details like market, size, avgPrice
         """
-        res = requests.get(f'https://data-api.polymarket.com/positions?user={self.browser_wallet}')
+        res = http.get(f'https://data-api.polymarket.com/positions?user={self.browser_wallet}')
         return pd.DataFrame(res.json())
     
     def get_raw_position(self, tokenId):
@@ -202,6 +264,39 @@ class PolymarketClient:
         """
         return int(self.conditional_tokens.functions.balanceOf(self.browser_wallet, int(tokenId)).call())
 
+    def get_raw_balances(self, token_ids):
+        """
+        Get raw balances for many outcome tokens plus USDC in a single RPC.
+
+        Bundles a Conditional Tokens balanceOfBatch call and a USDC balanceOf
+        call into one Multicall3 aggregate3 eth_call.
+        
+        Args:
+            token_ids (list): Token IDs to query
+            
+        Returns:
+            tuple: (usdc_raw, token_raws) - Raw USDC balance and a list of raw
+                   token balances in the same order as token_ids
+        """
+        from eth_abi import decode
+
+        token_ids = [int(token_id) for token_id in token_ids]
+
+        batch_call = self.conditional_tokens.encode_abi(
+            'balanceOfBatch', args=[[self.browser_wallet] * len(token_ids), token_ids]
+        )
+        usdc_call = self.usdc_contract.encode_abi('balanceOf', args=[self.browser_wallet])
+
+        results = self.multicall.functions.aggregate3([
+            (self.addresses['conditional_tokens'], False, batch_call),
+            (self.addresses['collateral'], False, usdc_call),
+        ]).call()
+
+        token_raws = decode(['uint256[]'], results[0][1])[0]
+        usdc_raw = decode(['uint256'], results[1][1])[0]
+
+        return int(usdc_raw), [int(raw) for raw in token_raws]
+
     def get_position(self, tokenId):
         """
         Get both raw and formatted position size for a token.
@@ -238,6 +333,15 @@ class PolymarketClient:
 
         return orders_df
     
+    def get_open_orders(self):
+        """
+        Get all open orders for the connected wallet as returned by the API.
+        
+        Returns:
+            list: Open orders as dicts, with numeric fields still as strings
+        """
+        return self.client.get_orders()
+
     def get_market_orders(self, market):
         """
         Get all open orders for a specific market.
@@ -280,6 +384,12 @@ class PolymarketClient:
         """
         self.client.cancel_market_orders(market=marketId)
 
+    def cancel_all(self):
+        """
+        Cancel every open order of the account.
+        """
+        self.client.cancel_all()
+
     
     def merge_positions(self, amount_to_merge, condition_id, is_neg_risk_market):
         """
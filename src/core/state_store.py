@@ -0,0 +1,34 @@
+import asyncio
+
+import src.core.global_state as global_state
+
+# Live trading state (positions, orders, performing, market indexes) has a
+# single writer: the event loop. Background threads build replacement values
+# off the loop and hand them over with publish(), so the event loop never sees
+# a half-built structure and never needs a lock to read one.
+
+
+def on_loop_thread():
+    try:
+        return asyncio.get_running_loop() is global_state.loop
+    except RuntimeError:
+        return False
+
+
+def publish(apply, *args):
+    """
+    Apply a state change on the event loop.
+
+    Runs immediately when called from the event loop itself or before the loop
+    has started (single-threaded startup), otherwise schedules it on the loop.
+
+    Args:
+        apply (callable): Function that writes the change into global_state
+        *args: Arguments passed to apply
+    """
+    loop = global_state.loop
+
+    if loop is None or not loop.is_running() or on_loop_thread():
+        apply(*args)
+    else:
+        loop.call_soon_threadsafe(apply, *args)
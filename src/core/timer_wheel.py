@@ -0,0 +1,123 @@
+import asyncio
+import math
+import time
+import traceback
+
+# Hashed timer wheel running on the event loop.
+#
+# Time is cut into ticks of `tick` seconds and the wheel has `slots` buckets;
+# a timer due at tick k goes into bucket k % slots with the number of full
+# revolutions left before it fires. Scheduling and cancelling are O(1) set
+# operations, and each tick only looks at one bucket. Deadlines are wall-clock
+# unix times (time.time()), so they can come straight from market end dates.
+
+
+class Timer:
+    """
+    Handle for a scheduled callback, used to cancel it.
+    """
+
+    __slots__ = ('deadline', 'callback', 'args', 'rounds', 'bucket')
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.rounds = 0
+        self.bucket = None
+
+    @property
+    def active(self):
+        return self.bucket is not None
+
+
+class TimerWheel:
+    """
+    Timers with O(1) schedule and cancel, fired on the event loop within one
+    tick of their deadline.
+    """
+
+    def __init__(self, tick=1.0, slots=512):
+        self.tick = tick
+        self.buckets = [set() for _ in range(slots)]
+        self.current = math.floor(time.time() / tick)
+        self.count = 0
+        self._task = None
+        self._wakeup = None
+
+    def schedule(self, deadline, callback, *args):
+        """
+        Call callback(*args) on the event loop at the deadline. Deadlines in
+        the past fire on the next tick. Must be called on the event loop.
+
+        Returns:
+            Timer: Handle for cancel()
+        """
+        timer = Timer(deadline, callback, args)
+
+        if self.count == 0:
+            # Idle wheel: no timers to skip, so jump straight to the present
+            self.current = max(self.current, math.floor(time.time() / self.tick))
+
+        target = max(math.ceil(deadline / self.tick), self.current + 1)
+        timer.rounds = (target - self.current - 1) // len(self.buckets)
+        timer.bucket = self.buckets[target % len(self.buckets)]
+        timer.bucket.add(timer)
+        self.count += 1
+
+        self._ensure_running()
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel a timer. Cancelling one that already fired is a no-op.
+        """
+        if timer is not None and timer.bucket is not None:
+            timer.bucket.discard(timer)
+            timer.bucket = None
+            self.count -= 1
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        elif self.count == 1:
+            # The wheel was idle
+            self._wakeup.set()
+
+    def advance(self, now):
+        """
+        Fire every timer due by `now`.
+        """
+        while (self.current + 1) * self.tick <= now:
+            self.current += 1
+            bucket = self.buckets[self.current % len(self.buckets)]
+
+            due = []
+            for timer in bucket:
+                if timer.rounds > 0:
+                    timer.rounds -= 1
+                else:
+                    due.append(timer)
+
+            for timer in due:
+                bucket.discard(timer)
+                timer.bucket = None
+                self.count -= 1
+
+            for timer in due:
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    print(f"Error in timer callback {timer.callback.__name__}")
+                    print(traceback.format_exc())
+
+    async def _run(self):
+        while True:
+            if self.count == 0:
+                # Nothing scheduled: sleep until schedule() wakes us
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            await asyncio.sleep(max(0.0, (self.current + 1) * self.tick - time.time()))
+            self.advance(time.time())
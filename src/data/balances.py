@@ -0,0 +1,84 @@
+import threading
+import time
+
+import src.core.global_state as global_state
+
+# Cached on-chain balances. All tracked outcome tokens and USDC are read in a
+# single Multicall3 request and reused for a few seconds, so merge checks
+# don't cost an RPC each. Fills and merges invalidate the cache.
+
+# Seconds a batch read stays valid
+BALANCE_TTL = 5
+
+# token id (str) -> raw balance from the last batch read
+raw_balances = {}
+usdc_raw = None
+fetched_at = 0.0
+
+# Bumped by invalidate() so a read that was in flight during a fill isn't
+# treated as fresh
+generation = 0
+
+_lock = threading.Lock()
+
+
+def invalidate():
+    """
+    Mark cached balances stale. Call after fills and merges.
+    """
+    global fetched_at, generation
+    fetched_at = 0.0
+    generation += 1
+
+
+def _refresh(tokens):
+    global usdc_raw, fetched_at
+
+    # Read every tracked token so the next market's check is a cache hit
+    tracked = list(dict.fromkeys([str(token) for token in tokens] + list(global_state.REVERSE_TOKENS)))
+
+    started_generation = generation
+    started_at = time.time()
+
+    usdc, token_raws = global_state.client.get_raw_balances(tracked)
+
+    raw_balances.update(zip(tracked, token_raws))
+    usdc_raw = usdc
+    if generation == started_generation:
+        fetched_at = started_at
+
+
+def _is_fresh(tokens):
+    if time.time() - fetched_at > BALANCE_TTL:
+        return False
+    return all(str(token) in raw_balances for token in tokens)
+
+
+def get_raw_positions(tokens):
+    """
+    Get raw on-chain balances for outcome tokens, refreshing the whole batch
+    if the cache is stale.
+
+    Args:
+        tokens (list): Token IDs
+
+    Returns:
+        list: Raw balances in the same order as tokens
+    """
+    with _lock:
+        if not _is_fresh(tokens):
+            _refresh(tokens)
+        return [raw_balances[str(token)] for token in tokens]
+
+
+def get_usdc_balance():
+    """
+    Get the USDC balance from the cached batch read.
+
+    Returns:
+        float: USDC balance in decimal format
+    """
+    with _lock:
+        if usdc_raw is None or not _is_fresh([]):
+            _refresh([])
+        return usdc_raw / 10**6
@@ -0,0 +1,329 @@
+"""
+Shared-memory order book snapshots.
+
+The trading process publishes the top levels of every book it tracks into a
+named shared-memory segment so other processes (update_markets.py,
+update_stats.py, dashboards) can read live books without hitting the REST API.
+
+Each token gets a fixed-size slot guarded by a sequence counter (seqlock):
+the writer makes the counter odd while it is writing and even once it is done,
+and readers retry whenever they see an odd counter or the counter moved while
+they were copying.
+"""
+import struct
+import time
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:  # pragma: no cover - platforms without shared memory
+    shared_memory = None
+    resource_tracker = None
+
+SEGMENT_NAME = "poly_maker_books"
+
+MAGIC = 0x504D424B        # "PMBK"
+LAYOUT_VERSION = 2
+
+DEFAULT_CAPACITY = 4096   # Maximum number of tokens in the segment
+DEFAULT_DEPTH = 50        # Price levels kept per side
+TOKEN_BYTES = 80          # Token ids are up to 78 decimal digits
+
+# Header: magic, layout version, capacity, depth, slots in use, and a counter
+# bumped whenever a slot is released or reused
+HEADER = struct.Struct("<IIIIII")
+HEADER_SIZE = 64
+
+# Slot meta: sequence, updated_at, n_bids, n_asks, token id
+SLOT_META = struct.Struct(f"<QdII{TOKEN_BYTES}s")
+
+READ_RETRIES = 100
+
+
+def _slot_size(depth):
+    # Meta followed by bids and asks as (price, size) float64 pairs
+    return SLOT_META.size + 2 * depth * 2 * 8
+
+
+def _segment_size(capacity, depth):
+    return HEADER_SIZE + capacity * _slot_size(depth)
+
+
+class BookSnapshotWriter:
+    """
+    Owns the shared-memory segment and publishes book tops into it.
+
+    Only the trading process should create a writer. Slots are assigned on
+    first sight of a token. Slots of released tokens are reused; readers check
+    the token id in the slot, so a cached index entry can't return another
+    token's book.
+    """
+
+    def __init__(self, name=SEGMENT_NAME, capacity=DEFAULT_CAPACITY, depth=DEFAULT_DEPTH):
+        self.capacity = capacity
+        self.depth = depth
+        self.slot_size = _slot_size(depth)
+        self.slots = {}
+        self.free_slots = []
+
+        size = _segment_size(capacity, depth)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a previous run that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.buf = self.shm.buf
+        self.reassignments = 0
+        HEADER.pack_into(self.buf, 0, MAGIC, LAYOUT_VERSION, capacity, depth, 0, 0)
+
+    def _slot_offset(self, slot):
+        return HEADER_SIZE + slot * self.slot_size
+
+    def _get_slot(self, token):
+        slot = self.slots.get(token)
+        if slot is not None:
+            return slot
+
+        if self.free_slots:
+            # Sequence 0 marks the slot as not yet published for the new token
+            slot = self.free_slots.pop()
+            SLOT_META.pack_into(self.buf, self._slot_offset(slot), 0, 0.0, 0, 0, token.encode())
+            self.slots[token] = slot
+            self._write_header()
+            return slot
+
+        slot = len(self.slots)
+        if slot >= self.capacity:
+            return None
+
+        # Write the token id before publishing the new slot count so readers
+        # never see a slot without its token
+        SLOT_META.pack_into(self.buf, self._slot_offset(slot), 0, 0.0, 0, 0, token.encode())
+        self.slots[token] = slot
+        HEADER.pack_into(self.buf, 0, MAGIC, LAYOUT_VERSION, self.capacity, self.depth, len(self.slots), self.reassignments)
+        return slot
+
+    def _write_header(self):
+        # Slot reassigned: readers rebuild their token index
+        self.reassignments += 1
+        n_slots = len(self.slots) + len(self.free_slots)
+        HEADER.pack_into(self.buf, 0, MAGIC, LAYOUT_VERSION, self.capacity, self.depth, n_slots, self.reassignments)
+
+    def release(self, token):
+        """
+        Stop publishing a token and free its slot for reuse.
+        """
+        slot = self.slots.pop(str(token), None)
+        if slot is None:
+            return
+
+        SLOT_META.pack_into(self.buf, self._slot_offset(slot), 0, 0.0, 0, 0, b'')
+        self.free_slots.append(slot)
+        self._write_header()
+
+    def publish(self, token, bids, asks):
+        """
+        Publish the top of a book.
+
+        Args:
+            token (str): Token id the book belongs to
+            bids (SortedDict): Bid price -> size, ascending by price
+            asks (SortedDict): Ask price -> size, ascending by price
+        """
+        slot = self._get_slot(str(token))
+        if slot is None:
+            return
+
+        offset = self._slot_offset(slot)
+        seq = struct.unpack_from("<Q", self.buf, offset)[0]
+
+        # Best levels first: highest bids, lowest asks
+        top_bids = list(bids.items()[-self.depth:])[::-1]
+        top_asks = list(asks.items()[:self.depth])
+
+        struct.pack_into("<Q", self.buf, offset, seq + 1)
+
+        levels = np.ndarray((2, self.depth, 2), dtype=np.float64, buffer=self.buf, offset=offset + SLOT_META.size)
+        if top_bids:
+            levels[0, :len(top_bids)] = top_bids
+        if top_asks:
+            levels[1, :len(top_asks)] = top_asks
+
+        struct.pack_into("<dII", self.buf, offset + 8, time.time(), len(top_bids), len(top_asks))
+        struct.pack_into("<Q", self.buf, offset, seq + 2)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class BookSnapshotReader:
+    """
+    Read-only view of the books published by the trading process.
+    """
+
+    def __init__(self, name=SEGMENT_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+
+        # Attaching registers the segment with this process's resource tracker,
+        # which would unlink it on exit and pull it out from under the writer
+        try:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+
+        self.buf = self.shm.buf
+        magic, version, self.capacity, self.depth, _, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.close()
+            raise ValueError(f"Unexpected book snapshot layout in {name}")
+
+        self.slot_size = _slot_size(self.depth)
+        self.slots = {}
+        self.scanned = 0
+        self.reassignments = 0
+
+    def _refresh_index(self):
+        n_slots, reassignments = HEADER.unpack_from(self.buf, 0)[4:]
+        if reassignments != self.reassignments:
+            self.slots = {}
+            self.scanned = 0
+            self.reassignments = reassignments
+
+        for slot in range(self.scanned, n_slots):
+            token = SLOT_META.unpack_from(self.buf, HEADER_SIZE + slot * self.slot_size)[4].rstrip(b"\x00").decode()
+            if token:
+                self.slots[token] = slot
+        self.scanned = n_slots
+
+    def tokens(self):
+        self._refresh_index()
+        return list(self.slots.keys())
+
+    def get_book(self, token, max_age=None):
+        """
+        Read a consistent snapshot of one book.
+
+        Args:
+            token (str): Token id to read
+            max_age (float, optional): Ignore books older than this many seconds
+
+        Returns:
+            dict: {'bids': ndarray, 'asks': ndarray, 'updated_at': float} with
+                  (price, size) rows ordered best first, or None if unavailable
+        """
+        token = str(token)
+        if token not in self.slots:
+            self._refresh_index()
+            if token not in self.slots:
+                return None
+
+        offset = HEADER_SIZE + self.slots[token] * self.slot_size
+
+        if SLOT_META.unpack_from(self.buf, offset)[4].rstrip(b"\x00").decode() != token:
+            # The slot was released or reused for another token
+            self._refresh_index()
+            if token not in self.slots:
+                return None
+            offset = HEADER_SIZE + self.slots[token] * self.slot_size
+
+        for _ in range(READ_RETRIES):
+            seq_before = struct.unpack_from("<Q", self.buf, offset)[0]
+            if seq_before == 0:
+                return None
+            if seq_before % 2 == 1:
+                time.sleep(0)
+                continue
+
+            updated_at, n_bids, n_asks = struct.unpack_from("<dII", self.buf, offset + 8)
+            levels = np.ndarray((2, self.depth, 2), dtype=np.float64, buffer=self.buf, offset=offset + SLOT_META.size)
+            bids = levels[0, :n_bids].copy()
+            asks = levels[1, :n_asks].copy()
+
+            if struct.unpack_from("<Q", self.buf, offset)[0] == seq_before:
+                if max_age is not None and time.time() - updated_at > max_age:
+                    return None
+                return {'bids': bids, 'asks': asks, 'updated_at': updated_at}
+
+        return None
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+# ============ Process-wide helpers ============
+
+# Seconds between attempts to (re)attach to the segment from reader processes.
+# Reattaching picks up a new segment after the trading process restarts.
+REATTACH_INTERVAL = 30
+
+_writer = None
+_reader = None
+_reader_attached_at = 0
+
+
+def publish_book(token, bids, asks):
+    """
+    Publish a book from the trading process, creating the segment on first use.
+    Failures are reported once and publishing is disabled afterwards so the
+    trading path never depends on shared memory being available.
+    """
+    global _writer
+
+    if _writer is False:
+        return
+
+    if _writer is None:
+        try:
+            _writer = BookSnapshotWriter()
+        except Exception as ex:
+            print(f"Shared-memory book snapshots disabled: {ex}")
+            _writer = False
+            return
+
+    _writer.publish(token, bids, asks)
+
+
+def release_book(token):
+    """
+    Stop publishing a token's book, e.g. once its market has expired.
+    """
+    if _writer:
+        _writer.release(token)
+
+
+def read_book(token, max_age=60):
+    """
+    Read a live book published by the trading process.
+
+    Returns:
+        dict or None: See BookSnapshotReader.get_book. None when the trading
+                      process is not running or does not track this token.
+    """
+    global _reader, _reader_attached_at
+
+    if shared_memory is None:
+        return None
+
+    now = time.time()
+    if now - _reader_attached_at > REATTACH_INTERVAL:
+        _reader_attached_at = now
+        if _reader is not None:
+            _reader.close()
+            _reader = None
+        try:
+            _reader = BookSnapshotReader()
+        except (FileNotFoundError, ValueError):
+            _reader = None
+
+    if _reader is None:
+        return None
+
+    return _reader.get_book(token, max_age=max_age)
@@ -1,12 +1,48 @@
 import json
+from collections import OrderedDict
 from sortedcontainers import SortedDict
 import src.core.global_state as global_state
 import src.core.CONSTANTS as CONSTANTS
 
-from src.trading.trading import perform_trade
+from src.trading.trade_scheduler import request_trade
 import time 
 import asyncio
 from src.data.data_utils import set_position, set_order, update_positions
+from src.data.book_snapshots import publish_book
+from src.data.reconciliation import note_activity
+from src.data.balances import invalidate as invalidate_balances
+from src.data.live_volatility import observe as observe_volatility
+from src.core.timer_wheel import TimerWheel
+from src.core.models import Fill
+
+# Seconds a matched trade stays in performing without being mined or
+# confirmed before it is dropped as stale
+PENDING_TIMEOUT = 15
+
+# Pending-trade expiry: 10ms ticks, and enough slots that a PENDING_TIMEOUT
+# deadline never needs a second revolution
+pending_wheel = TimerWheel(tick=0.01, slots=2048)
+
+# (col, trade id) -> expiry Timer
+pending_timers = {}
+
+# Recently processed user events, oldest first. Reconnects replay recent
+# events, and each trade arrives once per status.
+SEEN_CAPACITY = 10_000
+seen_events = OrderedDict()
+
+# A trade that reached one of these is never matched again
+TERMINAL_STATUSES = ('MINED', 'CONFIRMED', 'FAILED')
+
+# Lowercased wallet address and the client it was taken from
+_wallet_client = None
+_wallet = None
+
+# True while a position resync after a failed trade is waiting or running
+resync_pending = False
+
+# Markets with a failed trade waiting for the next resync, re-quoted after it
+resync_markets = set()
 
 def process_book_data(asset, json_data):
     global_state.all_data[asset] = {
@@ -18,6 +54,12 @@ def process_book_data(asset, json_data):
     global_state.all_data[asset]['bids'].update({float(entry['price']): float(entry['size']) for entry in json_data['bids']})
     global_state.all_data[asset]['asks'].update({float(entry['price']): float(entry['size']) for entry in json_data['asks']})
 
+def publish_snapshot(asset):
+    # Share the updated book with other processes (scanner, stats, dashboards)
+    book = global_state.all_data.get(asset)
+    if book is not None:
+        publish_book(book['asset_id'], book['bids'], book['asks'])
+
 def process_price_change(asset, side, price_level, new_size, asset_id=None):
     # Skip updates for the No token to prevent duplicated updates
     # Only process if asset_id matches the stored asset_id for this market
@@ -35,6 +77,16 @@ def process_price_change(asset, side, price_level, new_size, asset_id=None):
     else:
         book[price_level] = new_size
 
+def is_tracked(market, token=None):
+    """
+    Whether book events for a market (and token) should be applied. Events
+    still in flight when a market is released would otherwise recreate its
+    book, live volatility and snapshot slot.
+    """
+    if market not in global_state.markets:
+        return False
+    return token is None or str(token) in global_state.REVERSE_TOKENS
+
 def process_data(json_datas, trade=True):
     # Ensure input is always a list
     if isinstance(json_datas, dict):
@@ -44,11 +96,16 @@ def process_data(json_datas, trade=True):
         event_type = json_data['event_type']
         asset = json_data['market']
 
+        if event_type in ('book', 'price_change') and not is_tracked(asset, json_data.get('asset_id')):
+            continue
+
         if event_type == 'book':
             process_book_data(asset, json_data)
+            observe_volatility(asset)
+            publish_snapshot(asset)
 
             if trade:
-                asyncio.create_task(perform_trade(asset))
+                request_trade(asset, 'book')
                 
         elif event_type == 'price_change':
             for data in json_data['price_changes']:
@@ -59,13 +116,19 @@ def process_data(json_datas, trade=True):
                 asset_id = data.get('asset_id', None)
                 process_price_change(asset, side, price_level, new_size, asset_id)
 
-                if trade:
-                    asyncio.create_task(perform_trade(asset))
+            if trade:
+                request_trade(asset, 'book')
+
+            observe_volatility(asset)
+            publish_snapshot(asset)
         
 
         # pretty_print(f'Received book update for {asset}:', global_state.all_data[asset])
 
-def add_to_performing(col, id):
+def add_to_performing(col, id, started_at=None):
+    if started_at is None:
+        started_at = time.time()
+
     if col not in global_state.performing:
         global_state.performing[col] = set()
     
@@ -74,87 +137,198 @@ def add_to_performing(col, id):
 
     # Add the trade ID and track its timestamp
     global_state.performing[col].add(id)
-    global_state.performing_timestamps[col][id] = time.time()
+    global_state.performing_timestamps[col][id] = started_at
+
+    # Drop it if it is neither mined nor confirmed in time
+    pending_wheel.cancel(pending_timers.get((col, id)))
+    pending_timers[(col, id)] = pending_wheel.schedule(started_at + PENDING_TIMEOUT, expire_pending, col, id)
 
 def remove_from_performing(col, id):
+    pending_wheel.cancel(pending_timers.pop((col, id), None))
+
     if col in global_state.performing:
         global_state.performing[col].discard(id)
 
     if col in global_state.performing_timestamps:
         global_state.performing_timestamps[col].pop(id, None)
 
+def expire_pending(col, id):
+    # Timers only fire for trades still pending; remove_from_performing
+    # cancels them
+    pending_timers.pop((col, id), None)
+    print(f"Removing stale entry {id} from {col} after {PENDING_TIMEOUT} seconds")
+    remove_from_performing(col, id)
+
+def schedule_pending_expiry():
+    """
+    Start expiry timers for trades restored into performing from a
+    checkpoint. Trades already past the timeout expire on the next tick.
+    """
+    for col, ids in global_state.performing.items():
+        timestamps = global_state.performing_timestamps.get(col, {})
+        for id in list(ids):
+            add_to_performing(col, id, timestamps.get(id, time.time()))
+
+def normalized_wallet():
+    # Lowercased once per client instead of once per maker order
+    global _wallet_client, _wallet
+    client = global_state.client
+    if client is not _wallet_client:
+        _wallet_client = client
+        _wallet = client.browser_wallet.lower()
+    return _wallet
+
+def is_duplicate(key):
+    """
+    Remember an event key, returning True if it was already seen. The oldest
+    keys are forgotten once SEEN_CAPACITY is reached.
+    """
+    if key in seen_events:
+        seen_events.move_to_end(key)
+        return True
+
+    seen_events[key] = None
+    if len(seen_events) > SEEN_CAPACITY:
+        seen_events.popitem(last=False)
+    return False
+
+def parse_fill(row, wallet):
+    """
+    Build the fill for a trade event from our side of it.
+
+    Returns:
+        Fill: Our token, side, size and price for the trade
+    """
+    token = row['asset_id']
+    side = row['side'].lower()
+
+    for maker_order in row['maker_orders']:
+        if maker_order['maker_address'].lower() == wallet:
+            # We were the maker: our order may be on the other outcome of
+            # the market, or on the opposite side of the same one
+            if maker_order['outcome'] == row['outcome']:
+                maker_side = 'buy' if side == 'sell' else 'sell'
+                maker_token = token
+            else:
+                maker_side = side
+                maker_token = global_state.REVERSE_TOKENS[token]
+            return Fill(row['id'], row['market'], maker_token, maker_side,
+                        float(maker_order['matched_amount']), float(maker_order['price']), True)
+
+    return Fill(row['id'], row['market'], token, side, float(row['size']), float(row['price']), False)
+
+async def resync_positions(market):
+    """
+    Reload positions from the API after a failed trade, off the event loop,
+    then re-quote the market. Failures in any market that arrive while a
+    resync is waiting share it; those that arrive while it is running get
+    another one.
+    """
+    global resync_pending
+    resync_markets.add(market)
+    if resync_pending:
+        return
+
+    resync_pending = True
+    try:
+        while resync_markets:
+            # Give the API a moment to reflect the failure
+            await asyncio.sleep(2)
+            markets = list(resync_markets)
+            resync_markets.clear()
+
+            try:
+                await asyncio.to_thread(update_positions)
+            except Exception as ex:
+                print(f"Error resyncing positions after a failed trade: {ex}")
+
+            for failed_market in markets:
+                request_trade(failed_market, 'risk')
+    finally:
+        resync_pending = False
+
+def process_trade_event(row, wallet):
+    """
+    Apply one trade status transition.
+
+    Returns:
+        bool: True if the market should be re-quoted
+    """
+    trade_id = row['id']
+    status = row['status']
+
+    if is_duplicate((trade_id, status)):
+        return False
+
+    if status == 'MATCHED' and any((trade_id, later) in seen_events for later in TERMINAL_STATUSES):
+        # A replayed match for a trade that has already settled
+        return False
+
+    fill = parse_fill(row, wallet)
+    print(f"Trade {status}: {fill}")
+
+    note_activity('trade event')
+    invalidate_balances()
+
+    if status == 'MATCHED':
+        add_to_performing(fill.col, trade_id)
+        set_position(fill.token, fill.side, fill.size, fill.price)
+        return True
+
+    if status not in TERMINAL_STATUSES:
+        # RETRYING: still in flight, so it stays pending and the API
+        # positions, which don't include the fill yet, are not applied
+        if trade_id in global_state.performing.get(fill.col, ()):
+            add_to_performing(fill.col, trade_id)
+        return False
+
+    remove_from_performing(fill.col, trade_id)
+
+    if status == 'FAILED':
+        print(f"Trade failed for {fill.token}, resyncing positions")
+        asyncio.create_task(resync_positions(fill.market))
+        return False
+
+    return status == 'CONFIRMED'
+
 def process_user_data(rows):
+    # Ensure input is always a list
+    if isinstance(rows, dict):
+        rows = [rows]
+
+    wallet = normalized_wallet()
+    filled = set()
+    updated = set()
 
     for row in rows:
         market = row['market']
-
-        side = row['side'].lower()
         token = row['asset_id']
-            
-        if token in global_state.REVERSE_TOKENS:     
-            col = token + "_" + side
-
-            if row['event_type'] == 'trade':
-                size = 0
-                price = 0
-                maker_outcome = ""
-                taker_outcome = row['outcome']
-
-                is_user_maker = False
-                for maker_order in row['maker_orders']:
-                    if maker_order['maker_address'].lower() == global_state.client.browser_wallet.lower():
-                        print("User is maker")
-                        size = float(maker_order['matched_amount'])
-                        price = float(maker_order['price'])
-                        
-                        is_user_maker = True
-                        maker_outcome = maker_order['outcome'] #this is curious
-
-                        if maker_outcome == taker_outcome:
-                            side = 'buy' if side == 'sell' else 'sell' #need to reverse as we reverse token too
-                        else:
-                            token = global_state.REVERSE_TOKENS[token]
-                
-                if not is_user_maker:
-                    size = float(row['size'])
-                    price = float(row['price'])
-                    print("User is taker")
-
-                print("TRADE EVENT FOR: ", row['market'], "ID: ", row['id'], "STATUS: ", row['status'], " SIDE: ", row['side'], "  MAKER OUTCOME: ", maker_outcome, " TAKER OUTCOME: ", taker_outcome, " PROCESSED SIDE: ", side, " SIZE: ", size) 
-
-
-                if row['status'] == 'CONFIRMED' or row['status'] == 'FAILED' :
-                    if row['status'] == 'FAILED':
-                        print(f"Trade failed for {token}, decreasing")
-                        asyncio.create_task(asyncio.sleep(2))
-                        update_positions()
-                    else:
-                        remove_from_performing(col, row['id'])
-                        print("Confirmed. Performing is ", len(global_state.performing[col]))
-                        print("Last trade update is ", global_state.last_trade_update)
-                        print("Performing is ", global_state.performing)
-                        print("Performing timestamps is ", global_state.performing_timestamps)
-                        
-                        asyncio.create_task(perform_trade(market))
-
-                elif row['status'] == 'MATCHED':
-                    add_to_performing(col, row['id'])
-
-                    print("Matched. Performing is ", len(global_state.performing[col]))
-                    set_position(token, side, size, price)
-                    print("Position after matching is ", global_state.positions[str(token)])
-                    print("Last trade update is ", global_state.last_trade_update)
-                    print("Performing is ", global_state.performing)
-                    print("Performing timestamps is ", global_state.performing_timestamps)
-                    asyncio.create_task(perform_trade(market))
-                elif row['status'] == 'MINED':
-                    remove_from_performing(col, row['id'])
-
-            elif row['event_type'] == 'order':
-                print("ORDER EVENT FOR: ", row['market'], " STATUS: ",  row['status'], " TYPE: ", row['type'], " SIDE: ", side, "  ORIGINAL SIZE: ", row['original_size'], " SIZE MATCHED: ", row['size_matched'])
-                
-                set_order(token, side, float(row['original_size']) - float(row['size_matched']), row['price'])
-                asyncio.create_task(perform_trade(market))
 
-    else:
-        print(f"User date received for {market} but its not in")
+        if token not in global_state.REVERSE_TOKENS:
+            print(f"User data received for {market} but its not in")
+            continue
+
+        if row['event_type'] == 'trade':
+            if process_trade_event(row, wallet):
+                filled.add(market)
+
+        elif row['event_type'] == 'order':
+            if is_duplicate(('order', row['id'], row['type'], row['size_matched'])):
+                continue
+
+            side = row['side'].lower()
+            print(f"Order {row['type']} for {token} {side}: {row['size_matched']} of {row['original_size']} matched at {row['price']}")
+
+            if row['type'] == 'CANCELLATION':
+                remaining = 0
+            else:
+                remaining = float(row['original_size']) - float(row['size_matched'])
+            set_order(token, side, remaining, row['price'], row['id'])
+            note_activity('order event')
+            updated.add(market)
+
+    # Fills jump ahead of book-driven runs; order updates wait their turn
+    for market in filled:
+        request_trade(market, 'fill')
+    for market in updated - filled:
+        request_trade(market, 'book')
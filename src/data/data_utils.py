@@ -1,32 +1,50 @@
 import src.core.global_state as global_state
-from src.utils.utils import load_config
+from src.core.models import Position, Order, TokenOrders
+from src.data.order_index import build_order_index
+from src.trading.order_gateway import request_cancel_asset
+from src.trading.risk_engine import update_token as update_exposure, release_reservation, expire_reservations
+from src.core.state_store import publish
 import time
 
 #sth here seems to be removing the position
 def update_positions(avgOnly=False):
+    """
+    Refresh positions from the API, writing only entries that changed.
+    Safe to call from the background thread: changes are built off the event
+    loop and published to it in one step.
+
+    Positions in tokens that are no longer in the config (expired or
+    removed markets) are dropped once the API reports them empty.
+
+    Returns:
+        int: Number of positions that changed
+    """
+    started_at = time.time()
     pos_df = global_state.client.get_all_positions()
+    updates = {}
+    held = set()
 
-    for idx, row in pos_df.iterrows():
+    for row in pos_df.to_dict('records'):
         asset = str(row['asset'])
+        if row['size'] > 0:
+            held.add(asset)
 
-        if asset in  global_state.positions:
-            position = global_state.positions[asset].copy()
+        current = global_state.positions.get(asset)
+        if current is not None:
+            position = Position(current.size, current.avgPrice)
         else:
-            position = {'size': 0, 'avgPrice': 0}
+            position = Position()
 
-        position['avgPrice'] = row['avgPrice']
+        position.avgPrice = row['avgPrice']
 
         if not avgOnly:
-            position['size'] = row['size']
+            position.size = row['size']
         else:
             
             for col in [f"{asset}_sell", f"{asset}_buy"]:
                 #need to review this
                 if col not in global_state.performing or not isinstance(global_state.performing[col], set) or len(global_state.performing[col]) == 0:
-                    try:
-                        old_size = position['size']
-                    except:
-                        old_size = 0
+                    old_size = position.size
 
                     if asset in  global_state.last_trade_update:
                         if time.time() - global_state.last_trade_update[asset] < 5:
@@ -36,18 +54,45 @@ def update_positions(avgOnly=False):
                     if old_size != row['size']:
                         print(f"No trades are pending. Updating position from {old_size} to {row['size']} and avgPrice to {row['avgPrice']} using API")
     
-                    position['size'] = row['size']
+                    position.size = row['size']
                 else:
                     print(f"ALERT: Skipping update for {asset} because there are trades pending for {col} looking like {global_state.performing[col]}")
     
-        global_state.positions[asset] = position
+        if global_state.positions.get(asset) != position:
+            updates[asset] = position
+
+    for asset in list(global_state.positions):
+        if asset not in held and asset not in global_state.REVERSE_TOKENS:
+            updates[asset] = None
+
+    publish(apply_positions, updates, started_at)
+    return len(updates)
+
+def apply_positions(updates, started_at):
+    """
+    Apply positions built by update_positions(). None drops the position.
+    """
+    for asset, position in updates.items():
+        # A websocket fill landed after the API snapshot was taken, so the
+        # snapshot is older than what we already have
+        if global_state.last_trade_update.get(asset, 0) > started_at:
+            continue
+
+        if position is None:
+            # Re-added to the config since the snapshot was taken
+            if asset in global_state.REVERSE_TOKENS:
+                continue
+            global_state.positions.pop(asset, None)
+        else:
+            global_state.positions[asset] = position
+        update_exposure(asset)
 
 def get_position(token):
     token = str(token)
     if token in global_state.positions:
         return global_state.positions[token]
     else:
-        return {'size': 0, 'avgPrice': 0}
+        return Position()
 
 def set_position(token, side, size, price, source='websocket'):
     token = str(token)
@@ -61,8 +106,8 @@ def set_position(token, side, size, price, source='websocket'):
 
     if token in global_state.positions:
         
-        prev_price = global_state.positions[token]['avgPrice']
-        prev_size = global_state.positions[token]['size']
+        prev_price = global_state.positions[token].avgPrice
+        prev_size = global_state.positions[token].size
 
 
         if size > 0:
@@ -80,96 +125,67 @@ def set_position(token, side, size, price, source='websocket'):
             avgPrice_new = prev_price
 
 
-        global_state.positions[token]['size'] += size
-        global_state.positions[token]['avgPrice'] = avgPrice_new
+        # Replace rather than mutate so readers never see half an update
+        global_state.positions[token] = Position(prev_size + size, avgPrice_new)
     else:
-        global_state.positions[token] = {'size': size, 'avgPrice': price}
+        global_state.positions[token] = Position(size, price)
+
+    update_exposure(token)
 
     print(f"Updated position from {source}, set to ", global_state.positions[token])
 
 def update_orders():
-    all_orders = global_state.client.get_all_orders()
+    """
+    Refresh open orders from the API, writing only tokens whose orders changed.
+
+    Returns:
+        int: Number of tokens whose orders changed
+    """
+    raw_orders = global_state.client.get_open_orders()
+    orders, duplicates = build_order_index(raw_orders)
 
-    orders = {}
+    # We keep a single order per token and side; clean up extras without
+    # blocking the sync
+    for token in duplicates:
+        print(f"Multiple orders found for {token}, cancelling")
+        request_cancel_asset(token)
 
-    if len(all_orders) > 0:
-            for token in all_orders['asset_id'].unique():
-                
-                if token not in orders:
-                    orders[str(token)] = {'buy': {'price': 0, 'size': 0}, 'sell': {'price': 0, 'size': 0}}
+    removed = [token for token in global_state.orders if token not in orders]
+    updates = {token: token_orders for token, token_orders in orders.items()
+               if global_state.orders.get(token) != token_orders}
 
-                curr_orders = all_orders[all_orders['asset_id'] == str(token)]
-                
-                if len(curr_orders) > 0:
-                    sel_orders = {}
-                    sel_orders['buy'] = curr_orders[curr_orders['side'] == 'BUY']
-                    sel_orders['sell'] = curr_orders[curr_orders['side'] == 'SELL']
+    publish(apply_orders_diff, updates, removed)
+    return len(updates) + len(removed)
 
-                    for type in ['buy', 'sell']:
-                        curr = sel_orders[type]
+def apply_orders_diff(updates, removed):
+    expire_reservations()
 
-                        if len(curr) > 1:
-                            print("Multiple orders found, cancelling")
-                            global_state.client.cancel_all_asset(token)
-                            orders[str(token)] = {'buy': {'price': 0, 'size': 0}, 'sell': {'price': 0, 'size': 0}}
-                        elif len(curr) == 1:
-                            orders[str(token)][type]['price'] = float(curr.iloc[0]['price'])
-                            orders[str(token)][type]['size'] = float(curr.iloc[0]['original_size'] - curr.iloc[0]['size_matched'])
+    for token in removed:
+        global_state.orders.pop(token, None)
+        update_exposure(token)
 
-    global_state.orders = orders
+    global_state.orders.update(updates)
+    for token in updates:
+        update_exposure(token)
 
 def get_order(token):
     token = str(token)
     if token in global_state.orders:
-
-        if 'buy' not in global_state.orders[token]:
-            global_state.orders[token]['buy'] = {'price': 0, 'size': 0}
-
-        if 'sell' not in global_state.orders[token]:
-            global_state.orders[token]['sell'] = {'price': 0, 'size': 0}
-
         return global_state.orders[token]
     else:
-        return {'buy': {'price': 0, 'size': 0}, 'sell': {'price': 0, 'size': 0}}
+        return TokenOrders()
     
-def set_order(token, side, size, price):
-    curr = {}
-    curr = {side: {'price': 0, 'size': 0}}
+def set_order(token, side, size, price, order_id=None):
+    token = str(token)
 
-    curr[side]['size'] = float(size)
-    curr[side]['price'] = float(price)
+    # Only the updated side changed; keep the other side's order
+    current = global_state.orders.get(token)
+    curr = TokenOrders(current.buy, current.sell) if current is not None else TokenOrders()
+    curr[side] = Order(float(price), float(size))
 
-    global_state.orders[str(token)] = curr
+    global_state.orders[token] = curr
+    if side == 'buy':
+        # The order event for a placed buy replaces its reservation
+        release_reservation(token, order_id)
+    update_exposure(token)
     print("Updated order, set to ", curr)
-
-    
-
-def update_markets():
-    received_df, received_params = load_config()
-
-    if len(received_df) > 0:
-        # Ensure multiplier column exists and fill NaN values with empty string
-        if 'multiplier' not in received_df.columns:
-            received_df['multiplier'] = ''
-        else:
-            received_df['multiplier'] = received_df['multiplier'].fillna('')
-            
-        global_state.df, global_state.params = received_df.copy(), received_params
-    
-
-    for _, row in global_state.df.iterrows():
-        for col in ['token1', 'token2']:
-            row[col] = str(row[col])
-
-        if row['token1'] not in global_state.all_tokens:
-            global_state.all_tokens.append(row['token1'])
-
-        if row['token1'] not in global_state.REVERSE_TOKENS:
-            global_state.REVERSE_TOKENS[row['token1']] = row['token2']
-
-        if row['token2'] not in global_state.REVERSE_TOKENS:
-            global_state.REVERSE_TOKENS[row['token2']] = row['token1']
-
-        for col2 in [f"{row['token1']}_buy", f"{row['token1']}_sell", f"{row['token2']}_buy", f"{row['token2']}_sell"]:
-            if col2 not in global_state.performing:
-                global_state.performing[col2] = set()
\ No newline at end of file
@@ -0,0 +1,232 @@
+import math
+import time
+
+import src.core.global_state as global_state
+
+# Live volatility from websocket book updates, so the trading risk gate doesn't
+# wait for the hourly markets.json refresh.
+#
+# Each market's midpoint is sampled on the same 10 minute grid as the price
+# histories the updater uses (fidelity 10), rounded to 2 places, and log
+# returns between samples go into a ring buffer covering the longest window.
+# Every window keeps a running sum and sum of squares of its returns, updated
+# as returns enter and leave, so a lookup is O(1). The move since the last
+# sample is included as the newest return, so a jump shows up immediately.
+# Figures use the same annualization as find_markets, so they compare
+# directly with volatility_threshold.
+
+# Seconds between samples, matching the prices-history fidelity
+SAMPLE_INTERVAL = 600
+
+# Window name -> hours, same names as the markets.json columns
+LIVE_WINDOWS = {
+    '1_hour': 1,
+    '3_hour': 3,
+    '6_hour': 6,
+    '12_hour': 12,
+    '24_hour': 24,
+}
+
+CAPACITY = max(LIVE_WINDOWS.values()) * 3600 // SAMPLE_INTERVAL
+
+ANNUALIZATION = math.sqrt(60 * 24 * 252)
+
+# Running sums drift with float error; recompute them every this many returns
+RESUM_INTERVAL = CAPACITY
+
+
+class MarketVolatility:
+    """
+    Ring buffer of sampled log returns with running sums per window.
+    """
+
+    __slots__ = ('returns', 'count', 'bucket', 'sampled_mid', 'last_mid', 'started_at', 'sums')
+
+    def __init__(self, now, mid):
+        self.returns = [0.0] * CAPACITY
+        self.count = 0
+        self.bucket = int(now // SAMPLE_INTERVAL)
+        self.sampled_mid = mid
+        self.last_mid = mid
+        self.started_at = now
+        # window -> [returns in window, sum, sum of squares]
+        self.sums = {name: [hours * 3600 // SAMPLE_INTERVAL, 0.0, 0.0] for name, hours in LIVE_WINDOWS.items()}
+
+    def _add_return(self, r):
+        slot = self.count % CAPACITY
+
+        for entry in self.sums.values():
+            length = entry[0]
+            if self.count >= length:
+                dropped = self.returns[(self.count - length) % CAPACITY]
+                entry[1] -= dropped
+                entry[2] -= dropped * dropped
+            entry[1] += r
+            entry[2] += r * r
+
+        self.returns[slot] = r
+        self.count += 1
+
+        if self.count % RESUM_INTERVAL == 0:
+            self._resum()
+
+    def _resum(self):
+        for entry in self.sums.values():
+            n = min(self.count, entry[0])
+            window = [self.returns[(self.count - 1 - i) % CAPACITY] for i in range(n)]
+            entry[1] = sum(window)
+            entry[2] = sum(r * r for r in window)
+
+    def update(self, now, mid):
+        bucket = int(now // SAMPLE_INTERVAL)
+
+        if bucket > self.bucket:
+            # The last midpoint seen in the finished bucket becomes its sample;
+            # buckets without updates had an unchanged midpoint
+            self._add_return(math.log(self.last_mid / self.sampled_mid))
+            for _ in range(min(bucket - self.bucket - 1, CAPACITY)):
+                self._add_return(0.0)
+
+            self.sampled_mid = self.last_mid
+            self.bucket = bucket
+
+        self.last_mid = mid
+
+    def volatility(self, window):
+        """
+        Annualized sample std of the window's returns, or None with fewer
+        than two returns.
+        """
+        length, s1, s2 = self.sums[window]
+        n = min(self.count, length)
+
+        # Move since the last sample
+        r = math.log(self.last_mid / self.sampled_mid)
+        n += 1
+        s1 += r
+        s2 += r * r
+
+        if n < 2:
+            return None
+
+        variance = max((s2 - s1 * s1 / n) / (n - 1), 0.0)
+        return round(math.sqrt(variance) * ANNUALIZATION, 2)
+
+    def covers(self, now, window):
+        return now - self.started_at >= LIVE_WINDOWS[window] * 3600
+
+
+# market -> MarketVolatility
+estimators = {}
+
+
+def observe(market, now=None):
+    """
+    Feed the market's current book midpoint to its estimator. Call after book
+    and price_change events are applied.
+    """
+    book = global_state.all_data.get(market)
+    if book is None or not book['bids'] or not book['asks']:
+        return
+
+    mid = round((book['bids'].peekitem(-1)[0] + book['asks'].peekitem(0)[0]) / 2, 2)
+    if mid <= 0:
+        return
+
+    if now is None:
+        now = time.time()
+
+    estimator = estimators.get(market)
+    if estimator is None:
+        estimators[market] = MarketVolatility(now, mid)
+    else:
+        estimator.update(now, mid)
+
+
+def get_volatility(market, window='3_hour', fallback=None):
+    """
+    Current volatility for a market.
+
+    Once the estimator has seen a full window its figure is returned. Before
+    that, the larger of the live figure and the fallback (the markets.json
+    value) is used, so a quiet start can't hide a stale high reading.
+
+    Args:
+        market (str): Condition ID
+        window (str): One of LIVE_WINDOWS
+        fallback (float): Figure to use without enough live data
+
+    Returns:
+        float: Annualized volatility, or the fallback
+    """
+    estimator = estimators.get(market)
+    if estimator is None:
+        return fallback
+
+    live = estimator.volatility(window)
+    if live is None:
+        return fallback
+
+    if estimator.covers(time.time(), window) or fallback is None:
+        return live
+    return max(live, fallback)
+
+
+def forget(market):
+    """
+    Drop a market's estimator, e.g. when it is unsubscribed.
+    """
+    estimators.pop(market, None)
+
+
+if __name__ == "__main__":
+    # Agreement with the batch figures on a sampled random walk, and lookup cost
+    import random
+
+    import numpy as np
+    from sortedcontainers import SortedDict
+
+    from src.updater.volatility import series_volatility
+
+    rng = random.Random(5)
+    start = 1_760_000_000
+    market = 'test'
+    global_state.all_data[market] = {'asset_id': market, 'bids': SortedDict(), 'asks': SortedDict()}
+
+    price = 0.5
+    samples_t, samples_p = [], []
+    t = start
+    while t < start + 2 * 24 * 3600:
+        price = min(max(price + rng.gauss(0, 0.003), 0.05), 0.95)
+        book = global_state.all_data[market]
+        book['bids'].clear()
+        book['asks'].clear()
+        book['bids'][round(price - 0.01, 3)] = 100.0
+        book['asks'][round(price + 0.01, 3)] = 100.0
+        observe(market, now=t)
+
+        # Last midpoint of each bucket is what the live estimator samples
+        bucket_t = t - t % SAMPLE_INTERVAL
+        mid = round((round(price - 0.01, 3) + round(price + 0.01, 3)) / 2, 2)
+        if samples_t and samples_t[-1] == bucket_t:
+            samples_p[-1] = mid
+        else:
+            samples_t.append(bucket_t)
+            samples_p.append(mid)
+        t += rng.randint(5, 120)
+
+    estimator = estimators[market]
+    batch = series_volatility(np.array(samples_t), np.array(samples_p))
+    for name, hours in LIVE_WINDOWS.items():
+        # Same returns as the estimator: the last `length` sampled returns
+        # plus the move within the current bucket
+        length = hours * 3600 // SAMPLE_INTERVAL
+        p = np.array(samples_p[-(length + 2):])
+        expected = round(float(np.std(np.diff(np.log(p)), ddof=1) * ANNUALIZATION), 2)
+        print(f"{name}: live {estimator.volatility(name)}, recomputed {expected}, batch {batch[name]}")
+
+    lookups = 100_000
+    t0 = time.perf_counter()
+    for _ in range(lookups):
+        get_volatility(market, '3_hour', 0.0)
+    print(f"get_volatility: {(time.perf_counter() - t0) / lookups * 1e6:.2f} us per lookup")
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import src.core.global_state as global_state
+from src.core.state_store import publish
+from src.data.websocket_handlers import subscribe_market_tokens
+from src.data.market_lifecycle import schedule_market, unschedule_market, release_market
+from src.trading.order_gateway import request_cancel_asset
+from src.trading.risk_engine import rebuild as rebuild_exposure
+from src.utils.utils import CONFIG_DIR
+
+# Watches config/markets.json and config/params.json. Files are only read when
+# their mtime or size moved, only parsed when their content actually changed,
+# and only the markets that were added, removed or edited are applied to the
+# runtime indexes.
+
+MARKETS_FILE = 'markets.json'
+PARAMS_FILE = 'params.json'
+
+# filename -> (mtime_ns, size, digest) of the last content we parsed
+file_versions = {}
+
+
+def read_if_changed(filename):
+    """
+    Read and parse a config file if its content changed since the last call.
+
+    Returns:
+        tuple: (changed, data) - data is the parsed JSON when changed is True
+    """
+    filepath = os.path.join(CONFIG_DIR, filename)
+
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return False, None
+
+    previous = file_versions.get(filename)
+    if previous is not None and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+        return False, None
+
+    with open(filepath, 'rb') as f:
+        content = f.read()
+
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+    if previous is not None and previous[2] == digest:
+        # Touched but not edited
+        file_versions[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+        return False, None
+
+    try:
+        data = json.loads(content)
+    except ValueError as ex:
+        # Probably caught mid-save by an editor, try again on the next poll
+        print(f"Could not parse {filename}: {ex}")
+        return False, None
+
+    file_versions[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+    return True, data
+
+
+def normalize_markets(data):
+    """
+    Turn the markets.json payload into {condition_id: row}.
+    """
+    if isinstance(data, dict) and 'markets' in data:
+        data = data['markets']
+
+    markets = {}
+    for row in data or []:
+        if row.get('question', '') == "":
+            continue
+
+        row = dict(row)
+        row['token1'] = str(row['token1'])
+        row['token2'] = str(row['token2'])
+
+        if row.get('multiplier') is None:
+            row['multiplier'] = ''
+
+        markets[row['condition_id']] = row
+
+    return markets
+
+
+def diff_markets(old, new):
+    """
+    Returns:
+        tuple: (added, removed, changed) lists of condition ids
+    """
+    added = [market for market in new if market not in old]
+    removed = [market for market in old if market not in new]
+    changed = [market for market in new if market in old and old[market] != new[market]]
+    return added, removed, changed
+
+
+def update_markets():
+    """
+    Apply any changes to markets.json and params.json.
+
+    Cheap enough to call every second: when neither file changed this is just
+    two stat calls.
+
+    Returns:
+        bool: True if anything changed
+    """
+    markets_changed, markets_data = read_if_changed(MARKETS_FILE)
+    params_changed, params = read_if_changed(PARAMS_FILE)
+
+    if not markets_changed and not params_changed:
+        return False
+
+    diff = None
+    if markets_changed:
+        markets = normalize_markets(markets_data)
+
+        if len(markets) == 0:
+            # Keep trading the last good config
+            print(f"{MARKETS_FILE} has no markets, keeping the current config")
+        else:
+            diff = diff_markets(global_state.markets, markets)
+            added, removed, changed = diff
+            print(f"Market config changed: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+
+    if diff is not None:
+        publish(apply_markets, markets, diff)
+
+    if params_changed:
+        print("Trading params changed")
+        publish(apply_params, params)
+
+    return True
+
+
+def apply_params(params):
+    global_state.params = params
+
+
+def apply_markets(markets, diff):
+    added, removed, changed = diff
+    old_markets = global_state.markets
+
+    reverse_tokens = dict(global_state.REVERSE_TOKENS)
+    new_tokens = []
+
+    # Removed markets are released once the new indexes are built
+    released = []
+
+    for market in removed:
+        unschedule_market(market)
+        row = old_markets[market]
+        for token in (row['token1'], row['token2']):
+            reverse_tokens.pop(token, None)
+        released.append((market, (row['token1'], row['token2']), True))
+
+    markets = dict(markets)
+    for market in added + changed:
+        row = markets[market]
+        status = schedule_market(market, row)
+
+        if status == 'ended':
+            # Past its end date: not traded, and left out so it can't be
+            # subscribed again
+            del markets[market]
+            if market in old_markets:
+                old_row = old_markets[market]
+                for token in (old_row['token1'], old_row['token2']):
+                    reverse_tokens.pop(token, None)
+                    request_cancel_asset(token)
+                released.append((market, (old_row['token1'], old_row['token2']), False))
+            continue
+
+        if market in old_markets:
+            old_row = old_markets[market]
+            for token in (old_row['token1'], old_row['token2']):
+                reverse_tokens.pop(token, None)
+
+        # Markets that haven't opened yet are subscribed by their activation timer
+        if status == 'active' and row['token1'] not in global_state.all_tokens_set:
+            new_tokens.append(row['token1'])
+
+        reverse_tokens[row['token1']] = row['token2']
+        reverse_tokens[row['token2']] = row['token1']
+
+        for col in [f"{row['token1']}_buy", f"{row['token1']}_sell", f"{row['token2']}_buy", f"{row['token2']}_sell"]:
+            if col not in global_state.performing:
+                global_state.performing[col] = set()
+
+    global_state.all_tokens = global_state.all_tokens + new_tokens
+    global_state.all_tokens_set = global_state.all_tokens_set | set(new_tokens)
+
+    global_state.markets = markets
+    global_state.REVERSE_TOKENS = reverse_tokens
+    global_state.df = pd.DataFrame(list(markets.values()))
+
+    # Unsubscribe removed markets and drop their books, locks and
+    # bookkeeping. Orders of markets removed from the config are still
+    # tracked, since they aren't cancelled.
+    for market, tokens, keep_orders in released:
+        release_market(market, tokens, keep_orders)
+
+    # Token-to-market index and exposure aggregates for the new config
+    rebuild_exposure()
+
+    if new_tokens and global_state.market_websocket is not None:
+        asyncio.create_task(subscribe_market_tokens(new_tokens))
@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import time
+
+import pandas as pd
+
+import src.core.global_state as global_state
+from src.core.timer_wheel import TimerWheel
+from src.data.book_snapshots import release_book
+from src.data.live_volatility import forget as forget_volatility
+from src.data.websocket_handlers import subscribe_market_tokens, unsubscribe_market_tokens
+from src.data.data_processing import remove_from_performing
+from src.trading.order_gateway import request_cancel_asset
+from src.trading.risk_engine import rebuild as rebuild_exposure
+from src.trading.trading import forget_market
+from src.trading.trade_scheduler import forget_market as forget_trade_requests
+
+# Activation and expiry of short-lived markets (the 15 minute, hourly and
+# daily crypto markets). A market with an end date in markets.json is only
+# subscribed SUBSCRIBE_LEAD seconds before its window opens. At its end date
+# its orders are cancelled, its tokens are unsubscribed, and its per-market
+# state is evicted, so the subscription and memory stay flat however long the
+# bot runs. Markets without an end date are always active.
+#
+# Activation and expiry run from a timer wheel on the event loop.
+
+# Seconds before a window opens that its book is subscribed
+SUBSCRIBE_LEAD = 60
+
+# Window length by the recurrence written by update_crypto_markets.py
+RECURRENCE_SECONDS = {
+    '15m': 15 * 60,
+    'hourly': 60 * 60,
+    'daily': 24 * 60 * 60,
+}
+
+wheel = TimerWheel(tick=1.0)
+
+# market -> (activation timer, expiry timer)
+timers = {}
+
+
+def parse_end_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def market_window(row):
+    """
+    Returns:
+        tuple: (opens_at, closes_at) unix times, either None when unknown
+    """
+    closes_at = parse_end_date(row.get('end_date') or row.get('end_date_iso'))
+    if closes_at is None:
+        return None, None
+
+    duration = RECURRENCE_SECONDS.get(row.get('recurrence'))
+    opens_at = closes_at - duration if duration else None
+    return opens_at, closes_at
+
+
+def schedule_market(market, row, now=None):
+    """
+    Schedule a market's activation and expiry. Must run on the event loop.
+
+    Returns:
+        str: 'ended' if the market's window is over, 'waiting' if it will be
+             subscribed later, otherwise 'active'
+    """
+    if now is None:
+        now = time.time()
+
+    unschedule_market(market)
+    opens_at, closes_at = market_window(row)
+
+    if closes_at is not None and closes_at <= now:
+        return 'ended'
+
+    activation = None
+    status = 'active'
+    if opens_at is not None and opens_at - SUBSCRIBE_LEAD > now:
+        activation = wheel.schedule(opens_at - SUBSCRIBE_LEAD, activate_market, market)
+        status = 'waiting'
+
+    expiry = wheel.schedule(closes_at, expire_market, market) if closes_at is not None else None
+
+    if activation is not None or expiry is not None:
+        timers[market] = (activation, expiry)
+    return status
+
+
+def unschedule_market(market):
+    for timer in timers.pop(market, ()):
+        wheel.cancel(timer)
+
+
+def activate_market(market):
+    row = global_state.markets.get(market)
+    if row is None:
+        return
+
+    token = row['token1']
+    if token not in global_state.all_tokens_set:
+        global_state.all_tokens = global_state.all_tokens + [token]
+        global_state.all_tokens_set = global_state.all_tokens_set | {token}
+        asyncio.create_task(subscribe_market_tokens([token]))
+        print(f"Activated {row['question']}")
+
+
+def expire_market(market):
+    row = global_state.markets.get(market)
+    timers.pop(market, None)
+    if row is None:
+        return
+
+    print(f"Market expired, cancelling orders and unsubscribing: {row['question']}")
+    for token in (row['token1'], row['token2']):
+        request_cancel_asset(token)
+
+    evict_market(market, row)
+
+
+def evict_market(market, row):
+    """
+    Remove an expired market from the config state and release its
+    per-market state.
+    """
+    tokens = (row['token1'], row['token2'])
+
+    markets = dict(global_state.markets)
+    markets.pop(market, None)
+    global_state.markets = markets
+    global_state.df = pd.DataFrame(list(markets.values()))
+
+    reverse_tokens = dict(global_state.REVERSE_TOKENS)
+    for token in tokens:
+        reverse_tokens.pop(token, None)
+    global_state.REVERSE_TOKENS = reverse_tokens
+
+    release_market(market, tokens)
+    rebuild_exposure()
+
+
+def release_market(market, tokens, keep_orders=False):
+    """
+    Drop every per-market structure for a market that is no longer traded:
+    its subscription, book, live volatility, trade lock, snapshot slots and
+    per-token bookkeeping. Positions are kept until the API stops reporting
+    them. Must run on the event loop.
+
+    Args:
+        market (str): Condition ID
+        tokens (tuple): The market's two token IDs
+        keep_orders (bool): Keep tracking the market's open orders, for
+            markets removed from the config whose orders aren't cancelled
+    """
+    subscribed = [token for token in tokens if token in global_state.all_tokens_set]
+    if subscribed:
+        global_state.all_tokens_set = global_state.all_tokens_set - set(subscribed)
+        global_state.all_tokens = [token for token in global_state.all_tokens if token in global_state.all_tokens_set]
+        asyncio.create_task(unsubscribe_market_tokens(subscribed))
+
+    global_state.all_data.pop(market, None)
+    forget_volatility(market)
+    forget_market(market)
+    forget_trade_requests(market)
+
+    for token in tokens:
+        if not keep_orders:
+            global_state.orders.pop(token, None)
+        global_state.last_trade_update.pop(token, None)
+        release_book(token)
+        for side in ('buy', 'sell'):
+            col = f"{token}_{side}"
+            for trade_id in list(global_state.performing.get(col, ())):
+                remove_from_performing(col, trade_id)
+            global_state.performing.pop(col, None)
+            global_state.performing_timestamps.pop(col, None)
@@ -0,0 +1,98 @@
+from src.core.models import Order, TokenOrders
+
+
+def empty_token_orders():
+    return TokenOrders()
+
+
+def build_order_index(raw_orders):
+    """
+    Build the per-token, per-side order table in a single pass.
+
+    We only ever keep one order per token and side. Tokens with more than one
+    order on a side are reported as duplicates and left empty in the table,
+    since all of their orders are about to be cancelled.
+
+    Args:
+        raw_orders (list): Open orders as returned by the CLOB API
+
+    Returns:
+        tuple: (orders, duplicates) - {token: TokenOrders}
+               and the set of tokens that need their orders cancelled
+    """
+    orders = {}
+    seen_sides = set()
+    duplicates = set()
+
+    for order in raw_orders:
+        token = str(order['asset_id'])
+        side = order['side'].lower()
+
+        token_orders = orders.get(token)
+        if token_orders is None:
+            token_orders = orders[token] = empty_token_orders()
+
+        key = (token, side)
+        if key in seen_sides:
+            duplicates.add(token)
+            continue
+        seen_sides.add(key)
+
+        token_orders[side] = Order(
+            float(order['price']),
+            float(order['original_size']) - float(order['size_matched'])
+        )
+
+    for token in duplicates:
+        orders[token] = empty_token_orders()
+
+    return orders, duplicates
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m src.data.order_index
+    import random
+    import time
+    import pandas as pd
+
+    # The previous pandas implementation, for comparison
+    def _legacy_order_index(all_orders):
+        orders = {}
+        for token in all_orders['asset_id'].unique():
+            orders[str(token)] = empty_token_orders()
+            curr_orders = all_orders[all_orders['asset_id'] == str(token)]
+            for type, side in [('buy', 'BUY'), ('sell', 'SELL')]:
+                curr = curr_orders[curr_orders['side'] == side]
+                if len(curr) > 1:
+                    orders[str(token)] = empty_token_orders()
+                elif len(curr) == 1:
+                    orders[str(token)][type] = Order(float(curr.iloc[0]['price']),
+                                                     float(curr.iloc[0]['original_size'] - curr.iloc[0]['size_matched']))
+        return orders
+
+    n_tokens, n_orders, runs = 500, 2000, 20
+    tokens = [str(random.getrandbits(250)) for _ in range(n_tokens)]
+    raw_orders = [{
+        'asset_id': random.choice(tokens),
+        'side': random.choice(['BUY', 'SELL']),
+        'price': str(round(random.uniform(0.1, 0.9), 2)),
+        'original_size': str(random.randint(5, 100)),
+        'size_matched': '0',
+    } for _ in range(n_orders)]
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        build_order_index(raw_orders)
+    single_pass = (time.perf_counter() - start) / runs
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        orders_df = pd.DataFrame(raw_orders)
+        for col in ['original_size', 'size_matched', 'price']:
+            orders_df[col] = orders_df[col].astype(float)
+        _legacy_order_index(orders_df)
+    legacy = (time.perf_counter() - start) / runs
+
+    print(f"{n_tokens} tokens, {n_orders} orders")
+    print(f"single pass: {single_pass * 1000:.2f} ms")
+    print(f"pandas:      {legacy * 1000:.2f} ms ({legacy / single_pass:.0f}x slower)")
@@ -0,0 +1,73 @@
+import time
+
+from src.data.data_utils import update_positions, update_orders
+
+# User websocket events are the primary source of truth for positions and
+# orders. REST checks only catch what the socket missed, so they run often
+# right after fills or disconnects and back off while the account is quiet.
+
+# Seconds between REST checks right after activity
+MIN_INTERVAL = 5
+
+# Seconds between REST checks once nothing has happened for a while
+MAX_INTERVAL = 120
+
+# Growth factor applied to the interval after every quiet check
+BACKOFF = 2
+
+current_interval = MIN_INTERVAL
+next_check = 0
+checks_run = 0
+
+# Checks in a row that raised; each one doubles the wait before the next
+consecutive_failures = 0
+
+
+def note_activity(reason):
+    """
+    Record activity that may have left local state out of sync with the API
+    (a fill, a failed trade, a websocket disconnect) and schedule a prompt check.
+
+    Args:
+        reason (str): Short description, used for logging
+    """
+    global current_interval, next_check
+
+    if current_interval != MIN_INTERVAL:
+        print(f"Reconciliation: {reason}, checking within {MIN_INTERVAL}s")
+
+    current_interval = MIN_INTERVAL
+    next_check = min(next_check, time.time() + MIN_INTERVAL)
+
+
+def reconcile_if_due():
+    """
+    Run a REST check of positions and orders when one is due.
+
+    Returns:
+        bool: True if a check was run
+    """
+    global current_interval, next_check, checks_run, consecutive_failures
+
+    now = time.time()
+    if now < next_check:
+        return False
+
+    # Scheduled before the REST calls so a failing API isn't retried every
+    # second: back off from MIN_INTERVAL, doubling per failure in a row
+    next_check = now + min(MIN_INTERVAL * BACKOFF ** consecutive_failures, MAX_INTERVAL)
+    consecutive_failures += 1
+
+    positions_changed = update_positions(avgOnly=True)
+    orders_changed = update_orders()
+    checks_run += 1
+    consecutive_failures = 0
+
+    if positions_changed or orders_changed:
+        print(f"Reconciliation: applied {positions_changed} position and {orders_changed} order changes")
+        current_interval = MIN_INTERVAL
+    else:
+        current_interval = min(current_interval * BACKOFF, MAX_INTERVAL)
+
+    next_check = time.time() + current_interval
+    return True
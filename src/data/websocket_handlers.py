@@ -4,6 +4,8 @@ import websockets                  # WebSocket client
 import traceback                   # Exception handling
 
 from src.data.data_processing import process_data, process_user_data
+from src.data.reconciliation import note_activity
+from src.utils.profiling import mark
 import src.core.global_state as global_state
 
 async def connect_market_websocket(chunk):
@@ -27,6 +29,7 @@ async def connect_market_websocket(chunk):
         # Prepare and send subscription message
         message = {"assets_ids": chunk}
         await websocket.send(json.dumps(message))
+        global_state.market_websocket = websocket
 
         print("\n")
         print(f"Sent market subscription message: {message}")
@@ -35,9 +38,10 @@ async def connect_market_websocket(chunk):
             # Process incoming market data indefinitely
             while True:
                 message = await websocket.recv()
+                mark('first market message')
                 json_data = json.loads(message)
-                # Process order book updates and trigger trading as needed
-                process_data(json_data)
+                # Process order book updates and trigger trading once startup is done
+                process_data(json_data, trade=global_state.ready)
         except websockets.ConnectionClosed:
             print("Connection closed in market websocket")
             print(traceback.format_exc())
@@ -45,9 +49,47 @@ async def connect_market_websocket(chunk):
             print(f"Exception in market websocket: {e}")
             print(traceback.format_exc())
         finally:
+            global_state.market_websocket = None
+
             # Brief delay before attempting to reconnect
             await asyncio.sleep(5)
 
+async def subscribe_market_tokens(tokens):
+    """
+    Add tokens to the open market websocket subscription.
+    
+    Args:
+        tokens (list): Token IDs to subscribe to
+    """
+    websocket = global_state.market_websocket
+    if websocket is None:
+        # Picked up from global_state.all_tokens on the next connect
+        return
+
+    try:
+        await websocket.send(json.dumps({"assets_ids": tokens, "operation": "subscribe"}))
+        print(f"Subscribed to {len(tokens)} new tokens")
+    except Exception as e:
+        print(f"Could not subscribe to new tokens: {e}")
+
+async def unsubscribe_market_tokens(tokens):
+    """
+    Remove tokens from the open market websocket subscription.
+    
+    Args:
+        tokens (list): Token IDs to unsubscribe from
+    """
+    websocket = global_state.market_websocket
+    if websocket is None:
+        # Left out of the next connect since they are gone from all_tokens
+        return
+
+    try:
+        await websocket.send(json.dumps({"assets_ids": tokens, "operation": "unsubscribe"}))
+        print(f"Unsubscribed from {len(tokens)} tokens")
+    except Exception as e:
+        print(f"Could not unsubscribe from tokens: {e}")
+
 async def connect_user_websocket():
     """
     Connect to Polymarket's user WebSocket API and process order/trade updates.
@@ -94,5 +136,8 @@ async def connect_user_websocket():
             print(f"Exception in user websocket: {e}")
             print(traceback.format_exc())
         finally:
+            # Events may have been missed while disconnected
+            note_activity('user websocket disconnected')
+
             # Brief delay before attempting to reconnect
             await asyncio.sleep(5)
\ No newline at end of file
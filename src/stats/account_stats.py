@@ -2,7 +2,6 @@ import pandas as pd
 from py_clob_client.headers.headers import create_level_2_headers
 from py_clob_client.clob_types import RequestArgs
 
-import requests
 import json
 import os
 
@@ -10,10 +9,13 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from src.utils.utils import load_json, save_to_json
+from src.utils.records import read_records
+from src.utils import http
 
 def get_markets_df():
-    """Load markets from full_markets.json, fallback to markets.json if not found"""
-    data = load_json('full_markets.json')
+    """Load markets from full_markets, fallback to markets.json if not found"""
+    columns = ['question', 'answer1', 'answer2', 'token1', 'token2']
+    data = read_records('full_markets', columns=columns)
     if not data:
         # Fallback to markets.json if full_markets.json doesn't exist yet
         data = load_json('markets.json')
@@ -22,7 +24,7 @@ def get_markets_df():
     if not data:
         return pd.DataFrame()
     markets_df = pd.DataFrame(data)
-    markets_df = markets_df[['question', 'answer1', 'answer2', 'token1', 'token2']]
+    markets_df = markets_df[columns]
     markets_df['token1'] = markets_df['token1'].astype(str)
     markets_df['token2'] = markets_df['token2'].astype(str)
     return markets_df
@@ -116,7 +118,7 @@ def get_earnings(client):
         "requestPath": "/rewards/user/markets"
     }
 
-    r = requests.get(url,  params=params)
+    r = http.get(url,  params=params)
     results = r.json()
 
     data = pd.DataFrame(results['data'])
@@ -0,0 +1,224 @@
+import asyncio
+import time
+import traceback
+
+import src.core.global_state as global_state
+from src.trading.risk_engine import check_order, reserve, confirm_reservation, release_reservation
+
+# Tokens with a cancel request queued or in flight, so repeated requests
+# for the same token collapse into one API call
+pending_cancels = set()
+
+# Set by kill_switch(): no new orders are placed until resume_trading()
+halted = False
+halt_reason = None
+
+# Concurrent per-token cancels when the global cancel-all is unavailable
+FLATTEN_CONCURRENCY = 16
+
+# Checks of the API's open orders before a flatten gives up
+FLATTEN_ATTEMPTS = 5
+
+# Seconds between re-cancelling leftover orders and checking again
+FLATTEN_RECHECK_DELAY = 0.5
+
+# Running kill switch flatten, if any
+flatten_task = None
+
+# Outcome of the last flatten: reason, flat, seconds (trigger to verified
+# flat) and attempts
+last_flatten = {}
+
+
+def place_order(token, side, price, size, neg_risk=False):
+    """
+    Place an order after the portfolio pre-trade checks. Buys are reserved
+    in the risk engine until their order event arrives. Blocking, like the
+    client call it wraps; runs on the event loop.
+
+    Args:
+        token (str): Asset token ID
+        side (str): 'BUY' or 'SELL'
+        price (float): Limit price
+        size (float): Size in shares
+        neg_risk (bool): Whether the market is a neg-risk market
+
+    Returns:
+        dict: API response, or an empty dict if the order was not placed
+    """
+    if halted:
+        print(f"Trading halted ({halt_reason}), not placing {side} {size} at {price} for {token}")
+        return {}
+
+    reason = check_order(token, side, price, size)
+    if reason is not None:
+        print(f"Risk check rejected {side} {size} at {price} for {token}: {reason}")
+        return {}
+
+    if side.upper() != 'BUY':
+        return global_state.client.create_order(token, side, price, size, neg_risk)
+
+    reserve(token, price, size)
+    try:
+        response = global_state.client.create_order(token, side, price, size, neg_risk)
+    except Exception:
+        release_reservation(token)
+        raise
+
+    if not response or response.get('success') is False:
+        release_reservation(token)
+    else:
+        confirm_reservation(token, response.get('orderID'))
+    return response
+
+
+def kill_switch(reason):
+    """
+    Stop placing orders and cancel every open order. Safe to call from any
+    thread and from signal handlers; the cancels run on the event loop.
+    Trading stays halted until resume_trading().
+
+    Args:
+        reason (str): Logged and reported until trading resumes
+    """
+    global halted, halt_reason
+
+    triggered_at = time.perf_counter()
+    halted = True
+    halt_reason = reason
+    print(f"KILL SWITCH: {reason}. Cancelling all orders")
+
+    loop = global_state.loop
+    if loop is None or not loop.is_running():
+        global_state.client.cancel_all()
+        return
+
+    loop.call_soon_threadsafe(_start_flatten, reason, triggered_at)
+
+
+def resume_trading():
+    global halted, halt_reason
+
+    print(f"Resuming trading after halt ({halt_reason})")
+    halted = False
+    halt_reason = None
+
+
+def _start_flatten(reason, triggered_at):
+    global flatten_task
+
+    # A flatten already running will verify every order, including any
+    # placed since it started
+    if flatten_task is not None and not flatten_task.done():
+        return
+    flatten_task = asyncio.create_task(_flatten(reason, triggered_at))
+
+
+async def _cancel_tokens(tokens):
+    """
+    Cancel the orders of each token, at most FLATTEN_CONCURRENCY at a time.
+
+    Returns:
+        int: Number of cancel requests that failed
+    """
+    semaphore = asyncio.Semaphore(FLATTEN_CONCURRENCY)
+
+    async def cancel(token):
+        async with semaphore:
+            await asyncio.to_thread(global_state.client.cancel_all_asset, token)
+
+    results = await asyncio.gather(*(cancel(token) for token in tokens), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    for failure in failures[:5]:
+        print(f"Cancel failed: {failure}")
+    return len(failures)
+
+
+async def _flatten(reason, triggered_at):
+    """
+    Cancel everything, then check the API's open orders and cancel again
+    until none are left or FLATTEN_ATTEMPTS runs out.
+    """
+    # Imported here: data_utils imports this module
+    from src.data.data_utils import apply_orders_diff
+    from src.data.order_index import build_order_index
+
+    client = global_state.client
+
+    try:
+        await asyncio.to_thread(client.cancel_all)
+        print("Kill switch: cancel-all sent")
+    except Exception as ex:
+        # Fall back to cancelling token by token
+        tokens = [token for token, orders in global_state.orders.items()
+                  if orders.buy.size > 0 or orders.sell.size > 0]
+        print(f"Kill switch: cancel-all failed ({ex}), cancelling {len(tokens)} tokens")
+        await _cancel_tokens(tokens)
+
+    for attempt in range(1, FLATTEN_ATTEMPTS + 1):
+        try:
+            raw_orders = await asyncio.to_thread(client.get_open_orders)
+        except Exception as ex:
+            print(f"Kill switch: could not fetch open orders to verify ({ex})")
+            await asyncio.sleep(1)
+            continue
+
+        # Bring the order ledger up to date with what the API reports
+        orders, _ = build_order_index(raw_orders)
+        apply_orders_diff(orders, [token for token in global_state.orders if token not in orders])
+
+        remaining = {str(order['asset_id']) for order in raw_orders}
+        if not remaining:
+            seconds = time.perf_counter() - triggered_at
+            last_flatten.update(reason=reason, flat=True, seconds=seconds, attempts=attempt)
+            print(f"Kill switch: flat in {seconds:.2f}s ({reason})")
+            return
+
+        print(f"Kill switch: {len(raw_orders)} orders on {len(remaining)} tokens still open, "
+              f"cancelling (attempt {attempt} of {FLATTEN_ATTEMPTS})")
+        await _cancel_tokens(remaining)
+        await asyncio.sleep(FLATTEN_RECHECK_DELAY)
+
+    seconds = time.perf_counter() - triggered_at
+    last_flatten.update(reason=reason, flat=False, seconds=seconds, attempts=FLATTEN_ATTEMPTS)
+    print(f"Kill switch: NOT verified flat after {seconds:.2f}s and {FLATTEN_ATTEMPTS} checks. "
+          f"Trigger it again or cancel manually")
+
+
+def request_cancel_asset(token):
+    """
+    Queue cancellation of all orders for a token without blocking the caller.
+
+    Safe to call from the background update thread. The cancel runs on the
+    event loop (in a worker thread, since the CLOB client is blocking).
+    Falls back to a synchronous cancel before the event loop is running.
+
+    Args:
+        token (str): Asset token ID
+    """
+    token = str(token)
+    loop = global_state.loop
+
+    if loop is None or not loop.is_running():
+        global_state.client.cancel_all_asset(token)
+        return
+
+    loop.call_soon_threadsafe(_schedule_cancel, token)
+
+
+def _schedule_cancel(token):
+    if token in pending_cancels:
+        return
+
+    pending_cancels.add(token)
+    asyncio.create_task(_cancel_asset(token))
+
+
+async def _cancel_asset(token):
+    try:
+        await asyncio.to_thread(global_state.client.cancel_all_asset, token)
+    except Exception:
+        print(f"Error cancelling orders for {token}")
+        print(traceback.format_exc())
+    finally:
+        pending_cancels.discard(token)
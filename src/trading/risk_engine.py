@@ -0,0 +1,278 @@
+import time
+
+import src.core.global_state as global_state
+import src.core.CONSTANTS as CONSTANTS
+
+# Portfolio exposure aggregates with constant-time pre-trade checks.
+#
+# A token's exposure is the USDC it ties up: position size * average price,
+# plus price * size of our open buy order. Token exposures roll up into
+# their market, the market's event group (all outcomes of a neg-risk event,
+# which move together) and the whole account. Position and order writes call
+# update_token(), which applies the change as a delta to each level, so a
+# check never scans positions. The aggregates are rebuilt from global_state
+# only when the market config changes. Tokens outside the config (positions
+# left from removed markets, or opened elsewhere) count towards the account
+# only.
+#
+# A buy is reserved when it is placed, since its order event only arrives
+# later: until then the reservation stands in for the token's buy order, so
+# buys placed back to back are checked against each other. The order event
+# with the same order ID settles it; reservations whose event never came are
+# dropped after RESERVATION_TTL, at the next REST reconcile.
+#
+# The limits come from the optional "risk" section of params.json, with the
+# CONSTANTS values as defaults:
+#
+#   "risk": {"max_market_exposure": 500, "max_group_exposure": 1500, "max_account_exposure": 10000}
+#
+# Runs on the event loop, which is the only writer of positions and orders.
+
+# token -> (market, group) for tokens in the config
+token_index = {}
+
+# token -> (position exposure, buy order exposure)
+token_exposure = {}
+
+market_exposure = {}
+group_exposure = {}
+account_exposure = 0.0
+
+# token -> [buy exposure, order ID or None, reserved at] for placed buys
+# whose order event hasn't arrived yet
+reservations = {}
+
+# Seconds a reservation waits for its order event
+RESERVATION_TTL = 30
+
+
+def market_group(row):
+    """
+    Event group of a market: its neg-risk event, or its recurring series
+    for crypto markets, otherwise the market alone.
+    """
+    return row.get('neg_risk_market_id') or row.get('series_slug') or row['condition_id']
+
+
+def limits():
+    """
+    Returns:
+        tuple: (market, event group, account) exposure limits in USDC
+    """
+    risk = global_state.params.get('risk') or {}
+    return (
+        risk.get('max_market_exposure', CONSTANTS.MAX_MARKET_EXPOSURE),
+        risk.get('max_group_exposure', CONSTANTS.MAX_GROUP_EXPOSURE),
+        risk.get('max_account_exposure', CONSTANTS.MAX_ACCOUNT_EXPOSURE),
+    )
+
+
+def _exposures(token):
+    position = global_state.positions.get(token)
+    held = position.size * position.avgPrice if position is not None and position.size > 0 else 0.0
+
+    reservation = reservations.get(token)
+    if reservation is not None:
+        # The placed order replaces whatever buy order we had
+        bid = reservation[0]
+    else:
+        orders = global_state.orders.get(token)
+        bid = orders.buy.price * orders.buy.size if orders is not None else 0.0
+
+    return held, bid
+
+
+def update_token(token):
+    """
+    Apply a token's changed position or orders to the aggregates. O(1).
+    """
+    global account_exposure
+
+    token = str(token)
+    old_held, old_bid = token_exposure.get(token, (0.0, 0.0))
+    held, bid = _exposures(token)
+    if held == old_held and bid == old_bid:
+        return
+
+    delta = held - old_held + bid - old_bid
+    account_exposure += delta
+
+    entry = token_index.get(token)
+    if entry is None:
+        # Outside the config: account level only, forgotten once flat
+        if held or bid:
+            token_exposure[token] = (held, bid)
+        else:
+            token_exposure.pop(token, None)
+        return
+
+    token_exposure[token] = (held, bid)
+    market, group = entry
+    market_exposure[market] = market_exposure.get(market, 0.0) + delta
+    group_exposure[group] = group_exposure.get(group, 0.0) + delta
+
+
+def rebuild():
+    """
+    Recompute every aggregate after the market config changed. O(markets).
+    """
+    global account_exposure
+
+    token_index.clear()
+    token_exposure.clear()
+    market_exposure.clear()
+    group_exposure.clear()
+    account_exposure = 0.0
+
+    for market, row in global_state.markets.items():
+        group = market_group(row)
+        for token in (str(row['token1']), str(row['token2'])):
+            token_index[token] = (market, group)
+            update_token(token)
+
+    # Everything else we hold or bid on still counts towards the account
+    for token in list(global_state.positions) + list(global_state.orders) + list(reservations):
+        if token not in token_index:
+            update_token(token)
+
+
+def reserve(token, price, size):
+    """
+    Count a buy being placed towards the aggregates before its order event
+    arrives. O(1).
+    """
+    token = str(token)
+    reservations[token] = [price * size, None, time.time()]
+    update_token(token)
+
+
+def confirm_reservation(token, order_id):
+    """
+    Record the order ID the API gave a reserved buy, so only its own order
+    event settles the reservation.
+    """
+    reservation = reservations.get(str(token))
+    if reservation is not None:
+        reservation[1] = order_id
+
+
+def release_reservation(token, order_id=None):
+    """
+    Drop a token's reservation: the buy's order event arrived (order_id given)
+    or placing it failed (no order_id). Events for other orders leave it in
+    place. O(1).
+    """
+    token = str(token)
+    reservation = reservations.get(token)
+    if reservation is None:
+        return
+    if order_id is not None and reservation[1] is not None and reservation[1] != order_id:
+        return
+
+    del reservations[token]
+    update_token(token)
+
+
+def expire_reservations(now=None):
+    """
+    Drop reservations whose order event never arrived.
+    """
+    if now is None:
+        now = time.time()
+    for token in [token for token, reservation in reservations.items() if now - reservation[2] > RESERVATION_TTL]:
+        del reservations[token]
+        update_token(token)
+
+
+def check_order(token, side, price, size):
+    """
+    Pre-trade check for a new order that replaces the token's order on the
+    same side. Sells only reduce exposure and always pass. O(1).
+
+    Returns:
+        str or None: Why the order would breach a limit, or None if it is
+            within every limit
+    """
+    if side.upper() != 'BUY':
+        return None
+
+    token = str(token)
+    entry = token_index.get(token)
+    if entry is None:
+        return "token is not in the market config"
+
+    market, group = entry
+    _, current_bid = token_exposure.get(token, (0.0, 0.0))
+    delta = price * size - current_bid
+    market_limit, group_limit, account_limit = limits()
+
+    for name, exposure, limit in (
+        ('market', market_exposure.get(market, 0.0), market_limit),
+        ('event group', group_exposure.get(group, 0.0), group_limit),
+        ('account', account_exposure, account_limit),
+    ):
+        if exposure + delta > limit:
+            return f"{name} exposure {exposure + delta:.2f} would exceed {limit}"
+
+    return None
+
+
+def exposure_summary():
+    """
+    Returns:
+        dict: Account exposure and the largest market and group exposures
+    """
+    top_market = max(market_exposure.items(), key=lambda item: item[1], default=(None, 0.0))
+    top_group = max(group_exposure.items(), key=lambda item: item[1], default=(None, 0.0))
+    return {
+        'account': round(account_exposure, 2),
+        'top_market': (top_market[0], round(top_market[1], 2)),
+        'top_group': (top_group[0], round(top_group[1], 2)),
+    }
+
+
+if __name__ == "__main__":
+    # Parity check against a full recomputation: python -m src.trading.risk_engine
+    import random
+    import time
+    from src.core.models import Position, Order, TokenOrders
+
+    markets = {}
+    for i in range(2000):
+        markets[f"m{i}"] = {'condition_id': f"m{i}", 'token1': f"a{i}", 'token2': f"b{i}",
+                            'neg_risk_market_id': f"g{i // 10}" if i % 2 else ''}
+    global_state.markets = markets
+    rebuild()
+
+    # Positions outside the config count towards the account only
+    tokens = list(token_index) + [f"old{i}" for i in range(200)]
+    config_tokens = list(token_index)
+    start = time.perf_counter()
+    for _ in range(100_000):
+        token = random.choice(tokens)
+        action = random.random()
+        if action < 0.4:
+            global_state.positions[token] = Position(random.uniform(0, 200), random.uniform(0.1, 0.9))
+            update_token(token)
+        elif action < 0.8:
+            global_state.orders[token] = TokenOrders(Order(random.uniform(0.1, 0.9), random.uniform(0, 100)))
+            update_token(token)
+        elif action < 0.9:
+            reserve(token, random.uniform(0.1, 0.9), random.uniform(0, 100))
+        else:
+            release_reservation(token)
+    elapsed = time.perf_counter() - start
+
+    incremental = (account_exposure, dict(market_exposure), dict(group_exposure))
+    rebuild()
+    assert abs(incremental[0] - account_exposure) < 1e-6 * account_exposure
+    assert all(abs(incremental[1][m] - market_exposure[m]) < 1e-6 for m in market_exposure)
+    assert all(abs(incremental[2][g] - group_exposure[g]) < 1e-6 for g in group_exposure)
+
+    start = time.perf_counter()
+    for _ in range(100_000):
+        check_order(random.choice(config_tokens), 'BUY', 0.5, 50)
+    checks = time.perf_counter() - start
+
+    print(f"incremental updates match a rebuild; account exposure {account_exposure:.2f}")
+    print(f"update: {elapsed / 100_000 * 1e6:.2f} us, check: {checks / 100_000 * 1e6:.2f} us")
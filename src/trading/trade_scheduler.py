@@ -0,0 +1,194 @@
+import asyncio
+import collections
+import time
+import traceback
+
+import src.core.global_state as global_state
+from src.trading.trading import perform_trade
+
+# Prioritised perform_trade runs.
+#
+# Every trigger goes through request_trade(market, lane). Each market has at
+# most one run waiting and one running: requests for a market that is already
+# waiting are coalesced into it, keeping the more urgent lane. Workers always
+# start the most urgent waiting market next, so a fill is re-quoted ahead of
+# any backlog of book updates. Book-triggered runs of a market are spaced
+# BOOK_COOLDOWN apart; fill and risk runs start as soon as the market is free.
+
+# Lane -> priority, lower runs first
+LANES = {
+    'fill': 0,   # our trade was matched
+    'risk': 1,   # exposure changed some other way (failed trade, resync, risk limits)
+    'book': 2,   # the market's book or our orders changed
+}
+
+# Minimum seconds between the end of a run and a book-triggered run of the
+# same market
+BOOK_COOLDOWN = 2
+
+# Concurrent runs across markets
+WORKERS = 4
+
+# Recent queue waits kept per lane for percentiles
+LATENCY_SAMPLES = 1000
+
+
+class LaneStats:
+    """
+    Request counts and queue latency for one lane.
+    """
+    __slots__ = ('requests', 'coalesced', 'runs', 'total_wait', 'max_wait', 'total_run', 'waits')
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self.runs = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.waits = collections.deque(maxlen=LATENCY_SAMPLES)
+
+
+class Request:
+    __slots__ = ('lane', 'priority', 'seq', 'requested_at')
+
+    def __init__(self, lane, priority, seq, requested_at):
+        self.lane = lane
+        self.priority = priority
+        self.seq = seq
+        self.requested_at = requested_at
+
+
+lane_stats = {lane: LaneStats() for lane in LANES}
+
+# market -> Request waiting to run
+pending = {}
+
+# Markets with a run in progress
+running = set()
+
+# market -> perf_counter() when its last run ended
+last_run = {}
+
+# (priority, seq, market); entries superseded in `pending` are skipped
+queue = None
+workers = []
+_seq = 0
+
+
+def request_trade(market, lane='book'):
+    """
+    Ask for a perform_trade run of a market. Must be called on the event
+    loop.
+
+    Args:
+        market (str): Condition ID
+        lane (str): 'fill', 'risk' or 'book'
+    """
+    global _seq
+
+    stats = lane_stats[lane]
+    stats.requests += 1
+    priority = LANES[lane]
+
+    current = pending.get(market)
+    if current is not None and current.priority <= priority:
+        stats.coalesced += 1
+        return
+
+    _seq += 1
+    request = Request(lane, priority, _seq, time.perf_counter())
+    pending[market] = request
+
+    # A running market is requeued when its run finishes
+    if market not in running:
+        _enqueue(market, request)
+
+
+def forget_market(market):
+    """
+    Drop a removed market's waiting run and cooldown.
+    """
+    pending.pop(market, None)
+    last_run.pop(market, None)
+
+
+def _enqueue(market, request):
+    if request.lane == 'book':
+        wait = last_run.get(market, float('-inf')) + BOOK_COOLDOWN - time.perf_counter()
+        if wait > 0:
+            asyncio.get_running_loop().call_later(wait, _put, market, request)
+            return
+    _put(market, request)
+
+
+def _put(market, request):
+    # Superseded by a more urgent request, or already started
+    if pending.get(market) is not request or market in running:
+        return
+
+    _ensure_workers()
+    queue.put_nowait((request.priority, request.seq, market))
+
+
+def _ensure_workers():
+    global queue
+    if queue is None:
+        queue = asyncio.PriorityQueue()
+    if not workers:
+        for _ in range(WORKERS):
+            workers.append(asyncio.get_running_loop().create_task(_worker()))
+
+
+async def _worker():
+    while True:
+        _, seq, market = await queue.get()
+
+        request = pending.get(market)
+        if request is None or request.seq != seq or market in running:
+            continue
+
+        del pending[market]
+        running.add(market)
+
+        stats = lane_stats[request.lane]
+        started = time.perf_counter()
+        wait = started - request.requested_at
+        stats.total_wait += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.waits.append(wait)
+
+        try:
+            await perform_trade(market)
+        except Exception:
+            print(f"Error in trade run for {market}")
+            print(traceback.format_exc())
+        finally:
+            ended = time.perf_counter()
+            stats.runs += 1
+            stats.total_run += ended - started
+
+            running.discard(market)
+
+            # A market released during the run has already been forgotten
+            if market in global_state.markets:
+                last_run[market] = ended
+                waiting = pending.get(market)
+                if waiting is not None:
+                    _enqueue(market, waiting)
+            else:
+                pending.pop(market, None)
+
+
+def print_lane_stats():
+    """
+    Print per-lane request counts and queue wait (request to run start).
+    """
+    print(f"\n{'lane':<8}{'requests':>10}{'coalesced':>11}{'runs':>8}{'avg ms':>9}{'p99 ms':>9}{'max ms':>9}{'run ms':>9}")
+    for lane, stats in lane_stats.items():
+        avg_ms = stats.total_wait / stats.runs * 1000 if stats.runs else 0
+        run_ms = stats.total_run / stats.runs * 1000 if stats.runs else 0
+        waits = sorted(stats.waits)
+        p99_ms = waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000 if waits else 0
+        print(f"{lane:<8}{stats.requests:>10}{stats.coalesced:>11}{stats.runs:>8}{avg_ms:>9.1f}"
+              f"{p99_ms:>9.1f}{stats.max_wait * 1000:>9.1f}{run_ms:>9.1f}")
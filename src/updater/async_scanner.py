@@ -0,0 +1,239 @@
+import asyncio
+import random
+import time
+
+from src.updater.find_markets import history_params, store_history, add_volatility_from_store
+from src.updater.price_store import get_store
+from src.updater.book_fetcher import get_books_async
+from src.updater.reward_engine import score_markets
+from src.utils import http
+
+# Asyncio market scanner. Pages of reward markets are fetched one after the
+# other (each page needs the previous cursor). As soon as a page arrives its
+# order books are fetched in bulk and the whole page is scored at once; markets
+# that will make the selection then get their new price history points. All
+# volatility figures are computed in one batch at the end.
+# Concurrency adapts to the API: it grows while requests succeed and halves
+# on every 429 (AIMD).
+
+CLOB_API = "https://clob.polymarket.com"
+
+# The API returns this cursor after the last page
+END_CURSOR = 'LTE='
+
+# Concurrency limits for book and price history requests
+MIN_CONCURRENCY = 2
+MAX_CONCURRENCY = 64
+INITIAL_CONCURRENCY = 8
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5
+
+
+class RateLimitedError(Exception):
+    pass
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit with additive increase and multiplicative decrease.
+    Each success raises the limit by 1/limit, so roughly one extra slot per
+    round of requests; each 429 halves it.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttled(self):
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class ScanStats:
+    def __init__(self):
+        self.started_at = time.time()
+        self.pages = 0
+        self.markets = 0
+        self.books = 0
+        self.histories = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def report(self, limiter):
+        elapsed = time.time() - self.started_at
+        rate = self.requests / elapsed if elapsed > 0 else 0
+        print(f"Scan {elapsed:.0f}s: {self.pages} pages, {self.books}/{self.markets} books, "
+              f"{self.histories} histories, {rate:.1f} req/s, concurrency {int(limiter.limit)}, "
+              f"{self.retries} retries, {self.throttled} throttled, {self.failures} failed")
+
+
+async def fetch_json(url, params, limiter, stats, payload=None):
+    """
+    Call a JSON endpoint under the adaptive limiter, retrying 429s, 5xx and
+    connection errors with jittered exponential backoff. Other 4xx responses
+    fail at once, since retrying can't fix them. POSTs the payload when one
+    is given, otherwise GETs.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        retry_after = None
+        client_error = None
+
+        try:
+            async with limiter:
+                stats.requests += 1
+                if payload is None:
+                    response = await http.async_get(url, params=params, retry=False)
+                else:
+                    response = await http.async_post(url, json=payload, retry=False)
+
+            if response.status_code == 429:
+                stats.throttled += 1
+                limiter.on_throttled()
+                retry_after = response.headers.get('Retry-After')
+                raise RateLimitedError()
+
+            if 400 <= response.status_code < 500:
+                client_error = response
+            else:
+                response.raise_for_status()
+                limiter.on_success()
+                return response.json()
+
+        except Exception:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+
+        if client_error is not None:
+            client_error.raise_for_status()
+
+        stats.retries += 1
+        delay = BACKOFF_BASE * (2 ** attempt) + random.uniform(0, BACKOFF_BASE)
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        await asyncio.sleep(delay)
+
+
+async def fetch_history(ret, limiter, stats, selected):
+    try:
+        # Only points newer than what the price store already has
+        history = await fetch_json(f"{CLOB_API}/prices-history", history_params(ret['token1']), limiter, stats)
+        await asyncio.to_thread(store_history, ret['token1'], history['history'])
+        selected.append(ret)
+        stats.histories += 1
+    except Exception:
+        stats.failures += 1
+
+
+async def scan_page(rows, selected_questions, maker_reward, limiter, stats, results, selected):
+    async def post_json(url, payload):
+        return await fetch_json(url, None, limiter, stats, payload=payload)
+
+    try:
+        books = await get_books_async([row['tokens'][0]['token_id'] for row in rows], post_json)
+        scored = await asyncio.to_thread(score_markets, rows, books)
+    except Exception:
+        stats.failures += len(rows)
+        return
+
+    stats.books += len(scored)
+    results.extend(scored)
+
+    # Same rule as get_markets(): selected markets plus anything paying enough
+    await asyncio.gather(*(
+        fetch_history(ret, limiter, stats, selected)
+        for ret in scored
+        if ret['question'] in selected_questions or ret['gm_reward_per_100'] >= maker_reward
+    ))
+
+
+async def report_progress(stats, limiter):
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        stats.report(limiter)
+
+
+async def scan_markets(selected_questions, maker_reward):
+    """
+    Scan every reward market: pages, books and price histories pipelined.
+
+    Args:
+        selected_questions (set): Questions already in markets.json, which
+            always get volatility figures
+        maker_reward (float): Minimum gm_reward_per_100 for a new market to
+            get volatility figures
+
+    Returns:
+        tuple: (results, volatility) - per-market reward rows like
+               find_markets.process_row_with_book(), and {token1: row with volatility figures}
+    """
+    limiter = AdaptiveLimiter()
+    stats = ScanStats()
+    results = []
+    selected = []
+    tasks = []
+
+    reporter = asyncio.create_task(report_progress(stats, limiter))
+
+    try:
+        cursor = ''
+        while cursor != END_CURSOR:
+            try:
+                page = await fetch_json(f"{CLOB_API}/sampling-markets", {'next_cursor': cursor}, limiter, stats)
+            except Exception as ex:
+                print(f"Stopping market pagination: {ex}")
+                break
+
+            stats.pages += 1
+            rows = [row for row in page.get('data', []) if len(row.get('tokens') or []) == 2]
+            stats.markets += len(rows)
+            tasks.append(asyncio.create_task(
+                scan_page(rows, selected_questions, maker_reward, limiter, stats, results, selected)
+            ))
+
+            cursor = page.get('next_cursor')
+            if not cursor:
+                break
+
+        await asyncio.gather(*tasks)
+    finally:
+        reporter.cancel()
+        await http.close_async_client()
+
+    store = get_store()
+    await asyncio.to_thread(store.flush)
+    await asyncio.to_thread(store.compact)
+
+    volatility = await asyncio.to_thread(add_volatility_from_store, selected)
+
+    stats.report(limiter)
+    return results, volatility
+
+
+def run_scan(sel_df, maker_reward):
+    """
+    Blocking entry point for update_markets.py.
+    """
+    selected_questions = set(sel_df['question']) if len(sel_df) > 0 else set()
+    return asyncio.run(scan_markets(selected_questions, maker_reward))
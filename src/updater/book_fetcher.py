@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+from src.data.book_snapshots import read_book
+from src.utils import http
+
+# Bulk order book fetching for the updaters. Books come from, in order:
+# the trading process's shared-memory snapshots, a short-lived cache of
+# books fetched this run, and the CLOB multi-book endpoint (POST /books),
+# which returns up to BOOKS_CHUNK_SIZE books per request.
+#
+# Books are returned in REST order: lists of {'price', 'size'} dicts with the
+# best price last.
+
+CLOB_API = "https://clob.polymarket.com"
+
+BOOKS_CHUNK_SIZE = 100
+
+# Seconds a fetched book is reused, long enough to cover one updater run
+BOOK_CACHE_TTL = 60
+
+# token id -> (fetched_at, book)
+book_cache = {}
+
+# token id -> future for a bulk request already in flight (async path)
+_pending = {}
+
+EMPTY_BOOK = {'bids': [], 'asks': []}
+
+
+def _local_book(token):
+    local_book = read_book(token)
+    if local_book is None:
+        return None
+
+    # Snapshots are stored best first, the REST book is best last
+    return {
+        'bids': [{'price': price, 'size': size} for price, size in reversed(local_book['bids'])],
+        'asks': [{'price': price, 'size': size} for price, size in reversed(local_book['asks'])],
+    }
+
+
+def _cached_book(token, now):
+    local_book = _local_book(token)
+    if local_book is not None:
+        return local_book
+
+    cached = book_cache.get(token)
+    if cached is not None and now - cached[0] <= BOOK_CACHE_TTL:
+        return cached[1]
+
+    return None
+
+
+def _store(chunk, response_books, now):
+    books = {}
+    for book in response_books:
+        token = str(book.get('asset_id'))
+        books[token] = {'bids': book.get('bids') or [], 'asks': book.get('asks') or []}
+
+    # Tokens the API didn't return have no book
+    for token in chunk:
+        book = books.setdefault(token, EMPTY_BOOK)
+        book_cache[token] = (now, book)
+
+    return books
+
+
+def _split(tokens):
+    """
+    Dedupe tokens and split them into cached books and chunks to fetch.
+    """
+    now = time.time()
+    books = {}
+    missing = []
+
+    for token in dict.fromkeys(str(token) for token in tokens):
+        book = _cached_book(token, now)
+        if book is not None:
+            books[token] = book
+        else:
+            missing.append(token)
+
+    chunks = [missing[i:i + BOOKS_CHUNK_SIZE] for i in range(0, len(missing), BOOKS_CHUNK_SIZE)]
+    return books, chunks
+
+
+def get_books(tokens):
+    """
+    Get order books for many tokens with one request per BOOKS_CHUNK_SIZE
+    tokens that aren't already available locally.
+
+    Args:
+        tokens (list): Token IDs, duplicates allowed
+
+    Returns:
+        dict: {token: {'bids': [...], 'asks': [...]}} for every token
+    """
+    books, chunks = _split(tokens)
+
+    for chunk in chunks:
+        res = http.post(f"{CLOB_API}/books", json=[{'token_id': token} for token in chunk])
+        res.raise_for_status()
+        books.update(_store(chunk, res.json(), time.time()))
+
+    return books
+
+
+async def get_books_async(tokens, post_json=None):
+    """
+    Async version of get_books(). Chunks are fetched concurrently, and tokens
+    already being fetched by another call wait for that request instead of
+    being requested twice.
+
+    Args:
+        tokens (list): Token IDs, duplicates allowed
+        post_json (coroutine function, optional): post_json(url, payload)
+            returning the decoded response, for callers that add their own
+            rate limiting and retries
+
+    Returns:
+        dict: {token: {'bids': [...], 'asks': [...]}} for every token
+    """
+    if post_json is None:
+        async def post_json(url, payload):
+            res = await http.async_post(url, json=payload, retry=True)
+            res.raise_for_status()
+            return res.json()
+
+    books, chunks = _split(tokens)
+
+    loop = asyncio.get_running_loop()
+
+    # Claim tokens before the first await so concurrent calls see them
+    waiting = {}
+    to_fetch = []
+    for chunk in chunks:
+        own = [token for token in chunk if token not in _pending]
+        waiting.update({token: _pending[token] for token in chunk if token in _pending})
+        if own:
+            futures = {token: loop.create_future() for token in own}
+            _pending.update(futures)
+            to_fetch.append((own, futures))
+
+    async def fetch_chunk(chunk, futures):
+        try:
+            response_books = await post_json(f"{CLOB_API}/books", [{'token_id': token} for token in chunk])
+            fetched = _store(chunk, response_books, time.time())
+            for token, future in futures.items():
+                future.set_result(fetched[token])
+            return fetched
+        except Exception as ex:
+            for future in futures.values():
+                future.set_exception(ex)
+                # Only other callers await these; don't log them as unhandled
+                future.exception()
+            raise
+        finally:
+            for token in chunk:
+                _pending.pop(token, None)
+
+    for fetched in await asyncio.gather(*(fetch_chunk(chunk, futures) for chunk, futures in to_fetch)):
+        books.update(fetched)
+
+    for token, future in waiting.items():
+        books[token] = await future
+
+    return books
@@ -0,0 +1,272 @@
+import asyncio
+import heapq
+import time
+
+from src.updater.async_scanner import (
+    CLOB_API, END_CURSOR, AdaptiveLimiter, ScanStats, fetch_json, fetch_history, report_progress,
+)
+from src.updater.book_fetcher import get_books_async
+from src.updater.find_markets import add_volatility_from_store
+from src.updater.price_store import get_store
+from src.updater.reward_engine import score_markets
+from src.utils import http
+
+# Continuous market scanner. Instead of rescanning everything every hour, it
+# keeps per-market state and only refreshes what is stale:
+#
+# - The sampling-markets listing is re-read every LISTING_INTERVAL. New markets
+#   and markets whose reward parameters changed are due for a book refresh at
+#   once; markets that left the listing are dropped.
+# - Books are refreshed on a priority schedule (a heap of due times). A market
+#   whose book top moved is checked again after MIN_BOOK_INTERVAL; one that
+#   didn't move backs off, doubling up to MAX_BOOK_INTERVAL. Candidates for
+#   the output (selected markets and anything paying at least maker_reward)
+#   are never checked less often than CANDIDATE_BOOK_INTERVAL. Markets whose
+#   refresh failed are tried again after BOOK_RETRY_DELAY.
+# - Candidates get new price history points every HISTORY_INTERVAL, the
+#   spacing of the prices-history series, and their volatility is recomputed
+#   from the price store.
+#
+# Whenever anything changed, the caller's publish() gets the full result set
+# at most once per OUTPUT_INTERVAL.
+
+LISTING_INTERVAL = 5 * 60
+
+MIN_BOOK_INTERVAL = 60
+CANDIDATE_BOOK_INTERVAL = 2 * 60
+MAX_BOOK_INTERVAL = 30 * 60
+
+# Delay before markets whose book refresh failed are tried again
+BOOK_RETRY_DELAY = 30
+
+HISTORY_INTERVAL = 10 * 60
+
+OUTPUT_INTERVAL = 60
+
+# Seconds between scheduler rounds
+TICK = 5
+
+# Books refreshed per round at most, so a burst of due markets is spread out
+MAX_BOOKS_PER_ROUND = 1000
+
+
+class MarketState:
+    """
+    What the scanner knows about one sampling market.
+    """
+
+    __slots__ = ('row', 'fingerprint', 'result', 'top', 'book_interval', 'book_due', 'history_due', 'volatility')
+
+    def __init__(self, row, now):
+        self.row = row
+        self.fingerprint = reward_fingerprint(row)
+        self.result = None
+        self.top = None
+        self.book_interval = MIN_BOOK_INTERVAL
+        self.book_due = now
+        self.history_due = now
+        self.volatility = None
+
+
+def reward_fingerprint(row):
+    """
+    The listing fields that affect a market's reward score.
+    """
+    rewards = row.get('rewards') or {}
+    rates = tuple(sorted((rate['asset_address'].lower(), rate['rewards_daily_rate']) for rate in rewards.get('rates') or []))
+    return (rates, rewards.get('min_size'), rewards.get('max_spread'), row.get('minimum_tick_size'))
+
+
+class ContinuousScanner:
+    """
+    Per-market state and the refresh schedule.
+    """
+
+    def __init__(self, maker_reward):
+        self.maker_reward = maker_reward
+        self.markets = {}
+        self.schedule = []
+        self.selected_questions = set()
+        self.limiter = AdaptiveLimiter()
+        self.stats = ScanStats()
+        self.changed = False
+
+    def is_candidate(self, state):
+        if state.result is None:
+            return False
+        return state.result['question'] in self.selected_questions or state.result['gm_reward_per_100'] >= self.maker_reward
+
+    def schedule_books(self, condition_id, state, due):
+        state.book_due = due
+        heapq.heappush(self.schedule, (due, condition_id))
+
+    async def refresh_listing(self):
+        rows = []
+        cursor = ''
+        while cursor != END_CURSOR:
+            page = await fetch_json(f"{CLOB_API}/sampling-markets", {'next_cursor': cursor}, self.limiter, self.stats)
+            self.stats.pages += 1
+            rows.extend(row for row in page.get('data', []) if len(row.get('tokens') or []) == 2)
+            cursor = page.get('next_cursor')
+            if not cursor:
+                break
+
+        now = time.time()
+        listed = {}
+        added = updated = 0
+
+        for row in rows:
+            condition_id = row['condition_id']
+            listed[condition_id] = row
+            state = self.markets.get(condition_id)
+
+            if state is None:
+                state = self.markets[condition_id] = MarketState(row, now)
+                self.schedule_books(condition_id, state, now)
+                added += 1
+            else:
+                state.row = row
+                fingerprint = reward_fingerprint(row)
+                if fingerprint != state.fingerprint:
+                    state.fingerprint = fingerprint
+                    self.schedule_books(condition_id, state, now)
+                    updated += 1
+
+        removed = [condition_id for condition_id in self.markets if condition_id not in listed]
+        for condition_id in removed:
+            del self.markets[condition_id]
+
+        self.stats.markets = len(self.markets)
+        if removed:
+            self.changed = True
+        if added or updated or removed:
+            print(f"Listing: {len(self.markets)} markets, {added} new, {updated} reward changes, {len(removed)} closed")
+
+    def due_markets(self, now):
+        due = []
+        while self.schedule and self.schedule[0][0] <= now and len(due) < MAX_BOOKS_PER_ROUND:
+            scheduled_at, condition_id = heapq.heappop(self.schedule)
+            state = self.markets.get(condition_id)
+            # Skip entries for closed markets and ones superseded by a reschedule
+            if state is not None and state.book_due == scheduled_at:
+                due.append((condition_id, state))
+        return due
+
+    async def refresh_books(self, due):
+        async def post_json(url, payload):
+            return await fetch_json(url, None, self.limiter, self.stats, payload=payload)
+
+        rows = [state.row for _, state in due]
+        try:
+            books = await get_books_async([row['tokens'][0]['token_id'] for row in rows], post_json)
+            scored = await asyncio.to_thread(score_markets, rows, books)
+        except Exception:
+            # They were popped off the schedule; put them back or they would
+            # not be rescanned until their rewards change
+            retry_at = time.time() + BOOK_RETRY_DELAY
+            for condition_id, state in due:
+                self.schedule_books(condition_id, state, retry_at)
+            raise
+        self.stats.books += len(scored)
+
+        now = time.time()
+        for (condition_id, state), result in zip(due, scored):
+            top = (result['best_bid'], result['best_ask'])
+            if top != state.top:
+                state.book_interval = MIN_BOOK_INTERVAL
+            else:
+                state.book_interval = min(state.book_interval * 2, MAX_BOOK_INTERVAL)
+
+            if state.result is None or top != state.top or result['gm_reward_per_100'] != state.result['gm_reward_per_100']:
+                self.changed = True
+
+            state.top = top
+            state.result = result
+
+            interval = state.book_interval
+            if self.is_candidate(state):
+                interval = min(interval, CANDIDATE_BOOK_INTERVAL)
+            self.schedule_books(condition_id, state, now + interval)
+
+    async def refresh_histories(self, now):
+        due = [state for state in self.markets.values() if self.is_candidate(state) and state.history_due <= now]
+        if not due:
+            return
+
+        fetched = []
+        await asyncio.gather(*(fetch_history(state.result, self.limiter, self.stats, fetched) for state in due))
+        for state in due:
+            state.history_due = now + HISTORY_INTERVAL
+
+        store = get_store()
+        await asyncio.to_thread(store.flush)
+        await asyncio.to_thread(store.compact)
+
+        volatility = await asyncio.to_thread(add_volatility_from_store, fetched)
+        for state in due:
+            figures = volatility.get(state.result['token1'])
+            if figures is not None:
+                state.volatility = figures
+                self.changed = True
+
+    def snapshot(self):
+        results = [state.result for state in self.markets.values() if state.result is not None]
+        volatility = {
+            state.result['token1']: state.volatility
+            for state in self.markets.values()
+            if state.volatility is not None and self.is_candidate(state)
+        }
+        return results, volatility
+
+    async def run(self, load_selected_questions, publish):
+        reporter = asyncio.create_task(report_progress(self.stats, self.limiter))
+        next_listing = 0
+        next_output = 0
+
+        try:
+            while True:
+                now = time.time()
+
+                try:
+                    if now >= next_listing:
+                        self.selected_questions = await asyncio.to_thread(load_selected_questions)
+                        await self.refresh_listing()
+                        next_listing = now + LISTING_INTERVAL
+
+                    due = self.due_markets(now)
+                    if due:
+                        await self.refresh_books(due)
+
+                    await self.refresh_histories(now)
+                except Exception as ex:
+                    print(f"Continuous scan round failed: {ex}")
+
+                if self.changed and time.time() >= next_output:
+                    results, volatility = self.snapshot()
+                    try:
+                        await asyncio.to_thread(publish, results, volatility)
+                    except Exception as ex:
+                        print(f"Publishing results failed: {ex}")
+                    self.changed = False
+                    next_output = time.time() + OUTPUT_INTERVAL
+
+                await asyncio.sleep(TICK)
+        finally:
+            reporter.cancel()
+            await http.close_async_client()
+
+
+def run_continuous(load_selected_questions, publish, maker_reward):
+    """
+    Blocking entry point for update_markets.py. Runs until interrupted.
+
+    Args:
+        load_selected_questions (callable): Returns the set of questions in
+            markets.json; re-read with every listing refresh
+        publish (callable): publish(results, volatility), with the same
+            values as async_scanner.run_scan() returns
+        maker_reward (float): Minimum gm_reward_per_100 for a new market to
+            get volatility figures
+    """
+    scanner = ContinuousScanner(maker_reward)
+    asyncio.run(scanner.run(load_selected_questions, publish))
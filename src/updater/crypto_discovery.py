@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+import json
+import os
+import time
+
+from src.updater.async_scanner import AdaptiveLimiter, ScanStats, fetch_json
+from src.utils.utils import atomic_write
+from src.utils import http
+
+# Concurrent discovery of crypto up/down events by slug, with a persistent
+# cache so each 30 minute cycle only asks Gamma about slugs it hasn't seen.
+#
+# The cache maps slug -> {'event', 'checked_at', 'expires_at'}. Found events
+# are kept until their window ends. Slugs with no event yet are remembered for
+# NEGATIVE_TTL, since upcoming windows are listed some time before they open,
+# but never past the window's opening: a miss just before the open is checked
+# again NEAR_OPEN_TTL later.
+# Entries whose window has ended are dropped, and their events are never
+# returned.
+
+GAMMA_API = "https://gamma-api.polymarket.com"
+
+CACHE_DIR = 'state'
+CACHE_FILE = os.path.join(CACHE_DIR, 'crypto_slugs.json')
+
+# Seconds before a slug without an event is looked up again
+NEGATIVE_TTL = 2 * 60 * 60
+
+# Shortest wait before looking up a missing slug again, used once its window
+# is about to open or has opened
+NEAR_OPEN_TTL = 60
+
+# Window length by recurrence, to find when a window opens
+WINDOW_SECONDS = {
+    '15m': 15 * 60,
+    'hourly': 60 * 60,
+    'daily': 24 * 60 * 60,
+}
+
+# Upper bound on concurrent Gamma requests
+MAX_CONCURRENCY = 16
+
+
+def parse_json_list(value):
+    """
+    Gamma returns some list fields (clobTokenIds, outcomes) as JSON strings.
+    """
+    if isinstance(value, str):
+        value = json.loads(value) if value else []
+    return list(value or [])
+
+
+def event_end(event, window_end):
+    """
+    Unix time after which the event is no longer tradeable: its endDate when
+    Gamma has one, otherwise the end of the slug's window.
+    """
+    end_date = (event or {}).get('endDate')
+    if end_date:
+        try:
+            return datetime.datetime.fromisoformat(end_date.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return window_end
+
+
+def load_cache(now=None):
+    """
+    Load the slug cache, without entries whose window has ended.
+    """
+    if now is None:
+        now = time.time()
+
+    try:
+        with open(CACHE_FILE) as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    return {slug: entry for slug, entry in cache.items() if entry['expires_at'] > now}
+
+
+def save_cache(cache):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    atomic_write(CACHE_FILE, lambda f: json.dump(cache, f, separators=(',', ':')))
+
+
+def needs_fetch(entry, now, opens_at):
+    """
+    Whether a slug should be looked up: it isn't cached, or it had no event
+    and its negative TTL has passed. The TTL ends at the window's opening at
+    the latest.
+    """
+    if entry is None:
+        return True
+    if entry['event'] is not None:
+        return False
+
+    ttl = min(NEGATIVE_TTL, max(NEAR_OPEN_TTL, opens_at - entry['checked_at']))
+    return now - entry['checked_at'] >= ttl
+
+
+async def fetch_slugs(candidates, cache, now):
+    limiter = AdaptiveLimiter(maximum=MAX_CONCURRENCY)
+    stats = ScanStats()
+
+    async def fetch(slug, window_end):
+        try:
+            data = await fetch_json(f"{GAMMA_API}/events", {'slug': slug}, limiter, stats)
+        except Exception:
+            # Not cached, so the next cycle tries again
+            stats.failures += 1
+            return
+
+        event = data[0] if data else None
+        cache[slug] = {'event': event, 'checked_at': now, 'expires_at': event_end(event, window_end)}
+
+    try:
+        await asyncio.gather(*(fetch(slug, window_end) for slug, _, window_end in candidates))
+    finally:
+        await http.close_async_client()
+    return stats
+
+
+def discover_events(candidates):
+    """
+    Find the events for generated slugs, fetching only slugs that aren't
+    cached.
+
+    Args:
+        candidates (list): (slug, recurrence, window_end) tuples, window_end
+            in unix seconds
+
+    Returns:
+        list: (event, recurrence) pairs for live events, in candidate order
+    """
+    now = time.time()
+    cache = load_cache(now)
+
+    # Windows that have already ended can't be traded
+    candidates = [candidate for candidate in candidates if candidate[2] > now]
+    to_fetch = [
+        (slug, recurrence, window_end) for slug, recurrence, window_end in candidates
+        if needs_fetch(cache.get(slug), now, window_end - WINDOW_SECONDS.get(recurrence, 0))
+    ]
+
+    stats = asyncio.run(fetch_slugs(to_fetch, cache, now)) if to_fetch else ScanStats()
+    save_cache(cache)
+
+    events = []
+    for slug, recurrence, _ in candidates:
+        entry = cache.get(slug)
+        if entry is not None and entry['event'] is not None and entry['expires_at'] > now:
+            events.append((entry['event'], recurrence))
+
+    print(f"  {len(candidates)} slugs: {len(to_fetch)} fetched ({stats.failures} failed), "
+          f"{len(candidates) - len(to_fetch)} from cache, {len(events)} events in {time.time() - now:.1f}s")
+    return events
@@ -1,41 +1,17 @@
 import pandas as pd
 import numpy as np
 import os
-import requests
 import time
 import warnings
 warnings.filterwarnings("ignore")
 
+from src.updater.price_store import get_store
+from src.updater.volatility import batch_volatility
+
 
 if not os.path.exists('data'):
     os.makedirs('data')
     
-def get_all_markets(client):
-    cursor = ""
-    all_markets = []
-
-    while True:
-        try:
-            markets = client.get_sampling_markets(next_cursor = cursor)
-            markets_df = pd.DataFrame(markets['data'])
-
-
-            cursor = markets['next_cursor']
-            
-
-
-            all_markets.append(markets_df)
-
-            if cursor is None:
-                break
-        except:
-            break
-
-    all_df = pd.concat(all_markets)
-    all_df = all_df.reset_index(drop=True)
-
-    return all_df
-
 def get_bid_ask_range(ret, TICK_SIZE):
     bid_from = ret['midpoint'] - ret['max_spread'] / 100
     bid_to = ret['best_ask'] #Although bid to this high up will change bid_from because of changing midpoint, take optimistic approach
@@ -103,10 +79,28 @@ def add_formula_params(curr_df, midpoint, v, daily_reward):
     curr_df['reward_per_100'] = (curr_df['Q'] / curr_df['Q'].sum()) * daily_reward / 2 / curr_df['size'] * curr_df['100']
     return curr_df
 
-def process_single_row(row, client):
+def book_levels_to_dfs(bid_levels, ask_levels):
+    bids = pd.DataFrame()
+    asks = pd.DataFrame()
+
+    try:
+        bids = pd.DataFrame(bid_levels).astype(float)
+    except:
+        pass
+
+    try:
+        asks = pd.DataFrame(ask_levels).astype(float)
+    except:
+        pass
+
+    return bids, asks
+
+def process_row_with_book(row, bids, asks):
     ret = {}
     ret['question'] = row['question']
     ret['neg_risk'] = row['neg_risk']
+    # Shared by every outcome of a neg-risk event, for the risk engine
+    ret['neg_risk_market_id'] = row.get('neg_risk_market_id') or ''
 
     ret['answer1'] = row['tokens'][0]['outcome']
     ret['answer2'] = row['tokens'][1]['outcome']
@@ -124,21 +118,6 @@ def process_single_row(row, client):
             break
 
     ret['rewards_daily_rate'] = rate
-    book = client.get_order_book(token1)
-    
-    bids = pd.DataFrame()
-    asks = pd.DataFrame()
-
-    try:
-        bids = pd.DataFrame(book.bids).astype(float)
-    except:
-        pass
-
-    try:
-        asks = pd.DataFrame(book.asks).astype(float)
-    except:
-        pass
-
 
     try:
         ret['best_bid'] = bids.iloc[-1]['price']
@@ -207,30 +186,6 @@ def process_single_row(row, client):
     return ret
 
 
-def get_all_results(all_df, client, max_workers=5):
-    all_results = []
-
-    def process_with_progress(args):
-        idx, row = args
-        try:
-            return process_single_row(row, client)
-        except:
-            print("error fetching market")
-            return None
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_with_progress, (idx, row)) for idx, row in all_df.iterrows()]
-        
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result is not None:
-                all_results.append(result)
-
-            if len(all_results) % (max_workers * 2) == 0:
-                print(f'{len(all_results)} of {len(all_df)}')
-
-    return all_results
-
 def get_combined_markets(new_df, new_markets, sel_df):
 
     if len(sel_df) > 0:
@@ -244,8 +199,6 @@ def get_combined_markets(new_df, new_markets, sel_df):
     all_markets = all_markets.sort_values('gm_reward_per_100', ascending=False)
     return all_markets
 
-import concurrent.futures
-
 def calculate_annualized_volatility(df, hours):
     end_time = df['t'].max()
     start_time = end_time - pd.Timedelta(hours=hours)
@@ -254,68 +207,49 @@ def calculate_annualized_volatility(df, hours):
     annualized_volatility = volatility * np.sqrt(60 * 24 * 252)
     return round(annualized_volatility, 2)
 
-def add_volatility(row):
-    res = requests.get(f'https://clob.polymarket.com/prices-history?interval=1m&market={row["token1"]}&fidelity=10')
-    price_df = pd.DataFrame(res.json()['history'])
-    price_df['t'] = pd.to_datetime(price_df['t'], unit='s')
-    price_df['p'] = price_df['p'].round(2)
+# Longest volatility window plus a day, so the first return in the 30 day
+# window still has its previous point
+HISTORY_LOOKBACK = 31 * 24 * 60 * 60
+
+def history_params(token):
+    """
+    prices-history query for a token: only points after the newest stored one
+    when the store is recent enough, otherwise the full month.
+    """
+    last_t = get_store().last_timestamp(token)
+    if last_t is None or time.time() - last_t > 30 * 24 * 60 * 60:
+        return {'interval': '1m', 'market': token, 'fidelity': 10}
+    return {'startTs': last_t + 1, 'market': token, 'fidelity': 10}
+
+def store_history(token, history):
+    if history:
+        get_store().append(token, [point['t'] for point in history], [point['p'] for point in history])
+
+def add_volatility_from_store(rows):
+    """
+    Volatility figures for many markets from the price store, computed in one
+    batch.
+
+    Returns:
+        dict: {token1: {**row, **figures}} for every row with stored prices
+    """
+    store = get_store()
+    rows = [row for row in rows if store.last_timestamp(row['token1']) is not None]
+    series = [store.read(row['token1'], start=store.last_timestamp(row['token1']) - HISTORY_LOOKBACK) for row in rows]
+
+    results = {}
+    for row, figures in zip(rows, batch_volatility(series)):
+        if figures is not None:
+            results[row['token1']] = {**row, **figures}
+    return results
 
-    price_df.to_csv(f'data/{row["token1"]}.csv', index=False)
-    
-    price_df['log_return'] = np.log(price_df['p'] / price_df['p'].shift(1))
-
-    row_dict = row.copy()
-
-    stats = {
-        '1_hour': calculate_annualized_volatility(price_df, 1),
-        '3_hour': calculate_annualized_volatility(price_df, 3),
-        '6_hour': calculate_annualized_volatility(price_df, 6),
-        '12_hour': calculate_annualized_volatility(price_df, 12),
-        '24_hour': calculate_annualized_volatility(price_df, 24),
-        '7_day': calculate_annualized_volatility(price_df, 24 * 7),
-        '14_day': calculate_annualized_volatility(price_df, 24 * 14),
-        '30_day': calculate_annualized_volatility(price_df, 24 * 30),
-        'volatility_price': price_df['p'].iloc[-1]
-    }
-
-    new_dict = {**row_dict, **stats}
-    return new_dict
-
-def add_volatility_to_df(df, max_workers=2):
-    
-    results = []
-    df = df.reset_index(drop=True)
-
-    def process_volatility_with_progress(args):
-        idx, row = args
-        try:
-            ret = add_volatility(row.to_dict())
-            return ret
-        except:
-            print("Error fetching volatility")
-            return None
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_volatility_with_progress, (idx, row)) for idx, row in df.iterrows()]
-        
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result is not None:
-                results.append(result)
-                
-            if len(results) % (max_workers * 2) == 0:
-                print(f'{len(results)} of {len(df)}')
-            
-    return pd.DataFrame(results)
-
-    
 def get_markets(all_results, sel_df, maker_reward=1):
     new_df = pd.DataFrame(all_results)
     new_df['spread'] = abs(new_df['best_ask'] - new_df['best_bid'])
     new_df = new_df.sort_values('rewards_daily_rate', ascending=False)
     new_df[' '] = ''
 
-    new_df = new_df[['question', 'answer1', 'answer2', 'neg_risk', 'spread', 'best_bid', 'best_ask', 'rewards_daily_rate', 'bid_reward_per_100', 'ask_reward_per_100', 'gm_reward_per_100', 'sm_reward_per_100', 'min_size', 'max_spread', 'tick_size', 'market_slug', 'token1', 'token2', 'condition_id']]
+    new_df = new_df[['question', 'answer1', 'answer2', 'neg_risk', 'spread', 'best_bid', 'best_ask', 'rewards_daily_rate', 'bid_reward_per_100', 'ask_reward_per_100', 'gm_reward_per_100', 'sm_reward_per_100', 'min_size', 'max_spread', 'tick_size', 'market_slug', 'neg_risk_market_id', 'token1', 'token2', 'condition_id']]
     new_df = new_df.replace([np.inf, -np.inf], 0)
     all_data = new_df.copy()
     s_df = new_df.copy()
@@ -0,0 +1,328 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Append-only price-history store replacing the per-token CSVs in data/.
+#
+# Points live in two column files, t.<gen>.bin (int64 unix seconds) and
+# p.<gen>.bin (float64 prices), which are memory-mapped for reads. index.json maps each
+# token to the (start, count) segments it owns in those files plus its last
+# timestamp, and records the committed length. Appends go to the end of the
+# column files; the index is only rewritten (atomically) by flush(), after the
+# columns are fsynced, and any bytes past the committed length are dropped on
+# open, so a crash mid-run just means those points are fetched again. If the
+# columns are shorter than the index says (a crash before a flush's fsync
+# reached the disk), the index is cut back to the points actually stored.
+#
+# compact() writes a new generation of column files grouped by token, without
+# points older than RETENTION, and switches to it with the index write. It
+# runs at most once per COMPACT_INTERVAL.
+
+STORE_DIR = os.path.join('data', 'price_history')
+
+# Points older than this are dropped on compaction
+RETENTION = 35 * 24 * 60 * 60
+
+COMPACT_INTERVAL = 24 * 60 * 60
+
+T_DTYPE = np.dtype('<i8')
+P_DTYPE = np.dtype('<f8')
+
+
+class PriceStore:
+    """
+    Columnar, memory-mapped price histories for many tokens.
+    """
+
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+
+        self._lock = threading.RLock()
+        self._t_map = None
+        self._p_map = None
+        self._mapped_length = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {'generation': 0, 'length': 0, 'compacted_at': time.time(), 'tokens': {}}
+
+        self._set_generation(index['generation'])
+        self.length = index['length']
+        self.compacted_at = index['compacted_at']
+        # token -> {'segments': [[start, count], ...], 'last_t': int}
+        self.tokens = index['tokens']
+
+        stored = self.length
+        for path, dtype in ((self.t_path, T_DTYPE), (self.p_path, P_DTYPE)):
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            stored = min(stored, size // dtype.itemsize)
+
+        # Drop anything appended after the last flush. Never extend the
+        # columns: padding would be read back as points at t=0.
+        for path, dtype in ((self.t_path, T_DTYPE), (self.p_path, P_DTYPE)):
+            with open(path, 'ab') as f:
+                f.truncate(stored * dtype.itemsize)
+
+        if stored < self.length:
+            print(f"Price store: index counts {self.length} points but only {stored} are stored, dropping the rest")
+            self._clamp(stored)
+
+    def _clamp(self, stored):
+        # Cut every token's segments back to the first `stored` points
+        self.length = stored
+        t_map, _ = self._maps()
+
+        for token in list(self.tokens):
+            entry = self.tokens[token]
+            segments = []
+            for seg_start, count in entry['segments']:
+                count = min(count, stored - seg_start)
+                if count > 0:
+                    segments.append([seg_start, count])
+
+            if not segments:
+                del self.tokens[token]
+                continue
+            entry['segments'] = segments
+            seg_start, count = segments[-1]
+            entry['last_t'] = int(t_map[seg_start + count - 1])
+
+    def _column_paths(self, generation):
+        return (os.path.join(self.directory, f't.{generation}.bin'),
+                os.path.join(self.directory, f'p.{generation}.bin'))
+
+    def _set_generation(self, generation):
+        self.generation = generation
+        self.t_path, self.p_path = self._column_paths(generation)
+
+    def flush(self):
+        """
+        Commit appended points: fsync the columns, then write the index
+        atomically.
+        """
+        with self._lock:
+            for path in (self.t_path, self.p_path):
+                with open(path, 'ab') as f:
+                    os.fsync(f.fileno())
+
+            index = {'generation': self.generation, 'length': self.length, 'compacted_at': self.compacted_at, 'tokens': self.tokens}
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.index_path)
+            self._fsync_directory()
+
+    def _fsync_directory(self):
+        # Makes created and renamed files durable. Directories can't be
+        # opened on Windows, where renames are durable anyway.
+        if os.name == 'nt':
+            return
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def last_timestamp(self, token):
+        """
+        Returns:
+            int or None: Unix time of the newest stored point for the token
+        """
+        entry = self.tokens.get(str(token))
+        return entry['last_t'] if entry else None
+
+    def append(self, token, t, p):
+        """
+        Append points newer than the token's last stored timestamp.
+
+        Args:
+            token (str): Token ID
+            t (array-like): Unix seconds, ascending
+            p (array-like): Prices
+
+        Returns:
+            int: Number of points appended
+        """
+        token = str(token)
+        t = np.asarray(t, dtype=T_DTYPE)
+        p = np.asarray(p, dtype=P_DTYPE)
+
+        with self._lock:
+            entry = self.tokens.get(token)
+            if entry is not None:
+                newer = t > entry['last_t']
+                t, p = t[newer], p[newer]
+
+            if len(t) == 0:
+                return 0
+
+            with open(self.t_path, 'ab') as f:
+                f.write(t.tobytes())
+            with open(self.p_path, 'ab') as f:
+                f.write(p.tobytes())
+
+            if entry is None:
+                entry = self.tokens[token] = {'segments': [], 'last_t': 0}
+
+            segments = entry['segments']
+            if segments and segments[-1][0] + segments[-1][1] == self.length:
+                # Contiguous with this token's previous append
+                segments[-1][1] += len(t)
+            else:
+                segments.append([self.length, len(t)])
+
+            entry['last_t'] = int(t[-1])
+            self.length += len(t)
+            return len(t)
+
+    def _maps(self):
+        if self._mapped_length != self.length:
+            if self.length == 0:
+                self._t_map = np.empty(0, dtype=T_DTYPE)
+                self._p_map = np.empty(0, dtype=P_DTYPE)
+            else:
+                self._t_map = np.memmap(self.t_path, dtype=T_DTYPE, mode='r', shape=(self.length,))
+                self._p_map = np.memmap(self.p_path, dtype=P_DTYPE, mode='r', shape=(self.length,))
+            self._mapped_length = self.length
+        return self._t_map, self._p_map
+
+    def read(self, token, start=None, end=None):
+        """
+        Read a token's points with start <= t <= end.
+
+        Returns:
+            tuple: (t, p) arrays, ascending by time
+        """
+        with self._lock:
+            entry = self.tokens.get(str(token))
+            if entry is None:
+                return np.empty(0, dtype=T_DTYPE), np.empty(0, dtype=P_DTYPE)
+
+            t_map, p_map = self._maps()
+            t_parts, p_parts = [], []
+
+            for seg_start, count in entry['segments']:
+                seg_t = t_map[seg_start:seg_start + count]
+                lo = 0 if start is None else np.searchsorted(seg_t, start, side='left')
+                hi = count if end is None else np.searchsorted(seg_t, end, side='right')
+                if hi > lo:
+                    t_parts.append(np.array(seg_t[lo:hi]))
+                    p_parts.append(np.array(p_map[seg_start + lo:seg_start + hi]))
+
+        if not t_parts:
+            return np.empty(0, dtype=T_DTYPE), np.empty(0, dtype=P_DTYPE)
+        return np.concatenate(t_parts), np.concatenate(p_parts)
+
+    def read_many(self, tokens, start=None, end=None):
+        """
+        Returns:
+            dict: {token: (t, p)}
+        """
+        return {str(token): self.read(token, start, end) for token in tokens}
+
+    def compact(self, force=False):
+        """
+        Rewrite the store grouped by token, dropping points older than
+        RETENTION before each token's last timestamp.
+        """
+        with self._lock:
+            if not force and time.time() - self.compacted_at < COMPACT_INTERVAL:
+                return
+
+            old_paths = (self.t_path, self.p_path)
+            new_t, new_p = self._column_paths(self.generation + 1)
+            tokens = {}
+            length = 0
+
+            with open(new_t, 'wb') as ft, open(new_p, 'wb') as fp:
+                for token, entry in self.tokens.items():
+                    t, p = self.read(token, start=entry['last_t'] - RETENTION)
+                    if len(t) == 0:
+                        continue
+                    ft.write(t.tobytes())
+                    fp.write(p.tobytes())
+                    tokens[token] = {'segments': [[length, len(t)]], 'last_t': entry['last_t']}
+                    length += len(t)
+
+                # The new columns must be on disk before the index points at
+                # them, or a crash could leave an index over empty files
+                for f in (ft, fp):
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._fsync_directory()
+
+            self._t_map = self._p_map = None
+            self._mapped_length = -1
+
+            # The index write switches to the new generation
+            self._set_generation(self.generation + 1)
+            self.tokens = tokens
+            self.length = length
+            self.compacted_at = time.time()
+            self.flush()
+
+            for path in old_paths:
+                os.remove(path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    The shared store for data/price_history, opened on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore()
+    return _store
+
+
+def migrate_csvs(directory='data'):
+    """
+    One-off import of the per-token CSVs written by earlier versions.
+    The CSVs are left in place.
+    """
+    import pandas as pd
+
+    store = get_store()
+    imported = 0
+
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.csv'):
+            continue
+
+        token = filename[:-4]
+        df = pd.read_csv(os.path.join(directory, filename))
+        if len(df) == 0:
+            continue
+
+        t = pd.to_datetime(df['t']).to_numpy().astype('datetime64[s]').astype('int64')
+        order = np.argsort(t, kind='stable')
+        imported += store.append(token, t[order], df['p'].to_numpy()[order])
+
+    store.flush()
+    print(f"Imported {imported} points for {len(store.tokens)} tokens into {store.directory}")
+
+
+if __name__ == "__main__":
+    if '--migrate' in sys.argv:
+        migrate_csvs()
+    else:
+        print("Usage: python -m src.updater.price_store --migrate")
@@ -0,0 +1,304 @@
+import numpy as np
+
+# Vectorized maker-reward scoring. Does the same maths as
+# find_markets.process_row_with_book() for every market at once: the books
+# and reward parameters are flattened into NumPy arrays, each market's price
+# grid is built as one row of a 2-D array, and book sizes are matched to grid
+# prices with a single sort instead of a pandas merge per market.
+
+USDC_ADDRESS = '0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174'.lower()
+
+
+def round_like_python(values, decimals):
+    """
+    Round like Python's round() on floats. np.round scales by 10**decimals
+    first, which can tip values sitting just below a half (0.015 -> 0.02 where
+    round() gives 0.01), so values near a tie are rounded with round() itself.
+
+    The per-row code rounds NumPy scalars (anything derived from the book
+    DataFrames) with NumPy semantics and plain floats from the market JSON
+    with Python's, so both are used below to reproduce it exactly.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, decimals)
+
+    with np.errstate(invalid='ignore'):
+        scaled = values * 10.0 ** decimals
+        near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+
+    for i in np.flatnonzero(near_tie):
+        rounded.flat[i] = round(float(values.flat[i]), decimals)
+    return rounded
+
+
+def tick_decimals(tick_size):
+    return len(str(tick_size).split(".")[1])
+
+
+def reward_rate(row):
+    for rate_info in row['rewards']['rates']:
+        if rate_info['asset_address'].lower() == USDC_ADDRESS:
+            return rate_info['rewards_daily_rate']
+    return 0
+
+
+def flatten_levels(sides):
+    """
+    Flatten per-market book sides into CSR arrays.
+
+    Args:
+        sides (list): One list of {'price', 'size'} levels per market
+
+    Returns:
+        tuple: (prices, sizes, offsets) - market i's levels are
+               prices[offsets[i]:offsets[i + 1]]
+    """
+    counts = np.fromiter((len(levels) for levels in sides), dtype=np.int64, count=len(sides))
+    offsets = np.zeros(len(sides) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    prices = np.fromiter((float(level['price']) for levels in sides for level in levels), dtype=np.float64, count=offsets[-1])
+    sizes = np.fromiter((float(level['size']) for levels in sides for level in levels), dtype=np.float64, count=offsets[-1])
+    return prices, sizes, offsets
+
+
+def last_price(prices, offsets):
+    # REST books list the best price last; 0 for an empty side
+    counts = np.diff(offsets)
+    return np.where(counts > 0, prices[np.maximum(offsets[1:] - 1, 0)] if len(prices) else 0.0, 0.0)
+
+
+def bid_ask_ranges(best_bid, best_ask, midpoint, max_spread, tick):
+    """
+    Vectorized find_markets.get_bid_ask_range().
+    """
+    step = tick + 0.1 * tick
+
+    bid_from = midpoint - max_spread / 100
+    bid_to = np.where(best_ask == 0, midpoint, best_ask)
+    bid_to = np.where(bid_to - tick > midpoint, best_bid + step, bid_to)
+    bid_from = np.where(bid_from > bid_to, bid_to - step, bid_from)
+
+    ask_to = midpoint + max_spread / 100
+    ask_from = np.where(best_bid == 0, midpoint, best_bid)
+    ask_from = np.where(ask_from + tick < midpoint, best_ask - step, ask_from)
+    ask_to = np.where(ask_from > ask_to, ask_from + step, ask_to)
+
+    bid_from = np.maximum(np.round(bid_from, 3), 0)
+    bid_to = np.round(bid_to, 3)
+    ask_from = np.maximum(np.round(ask_from, 3), 0)
+    ask_to = np.round(ask_to, 3)
+
+    return bid_from, bid_to, ask_from, ask_to
+
+
+def price_grids(start, end, tick, decimals):
+    """
+    Vectorized find_markets.generate_numbers(): one row per market, padded
+    with NaN past the end of each market's grid.
+    """
+    scaled = start * 100
+    first = np.where(np.mod(scaled, 1) != 0, (np.trunc(scaled) + 1) / 100, start + tick)
+
+    # Grids are at most (end - first) / tick points long
+    spans = np.where(end > first, (end - first) / tick, 0)
+    width = int(np.ceil(spans.max())) + 2 if len(spans) else 1
+
+    grid = np.empty((len(start), width))
+    grid[:, 0] = first
+
+    # Same step-and-round recurrence as the scalar loop, one column at a time
+    # and rounded per tick precision
+    groups = [(d, decimals == d) for d in np.unique(decimals)]
+    for k in range(1, width):
+        column = grid[:, k - 1] + tick
+        for d, mask in groups:
+            column[mask] = round_like_python(column[mask], int(d))
+        grid[:, k] = column
+
+    # generate_numbers stops at the first point past the end
+    grid[~np.logical_and.accumulate(grid < end[:, None], axis=1)] = np.nan
+    return grid
+
+
+def match_sizes(grid, prices, sizes, offsets):
+    """
+    Book size at every grid price (0 if the book has no level there), using
+    exact float equality like the pandas merge did.
+    """
+    n_markets = grid.shape[0]
+    grid_market, grid_col = np.nonzero(~np.isnan(grid))
+    grid_price = grid[grid_market, grid_col]
+
+    level_market = np.repeat(np.arange(n_markets), np.diff(offsets))
+
+    # Book levels sort just before grid points with the same (market, price)
+    markets = np.concatenate([level_market, grid_market])
+    values = np.concatenate([prices, grid_price])
+    kinds = np.concatenate([np.zeros(len(prices), dtype=np.int8), np.ones(len(grid_price), dtype=np.int8)])
+    order = np.lexsort((kinds, values, markets))
+
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+
+    grid_pos = position[len(prices):]
+    prev = order[np.maximum(grid_pos - 1, 0)]
+    matched = (grid_pos > 0) & (prev < len(prices)) & (markets[prev] == grid_market) & (values[prev] == grid_price)
+
+    matched_sizes = np.zeros(len(grid_price))
+    matched_sizes[matched] = sizes[prev[matched]]
+    return grid_market, grid_price, matched_sizes
+
+
+def side_rewards(start, end, midpoint, v, rate, tick, decimals, prices, sizes, offsets):
+    """
+    Best reward_per_100 on one side of every market, rounded to 2 places.
+    NaN when the grid is empty, 0 when the book side is empty.
+    """
+    n_markets = len(start)
+    grid = price_grids(start, end, tick, decimals)
+    market, price, size = match_sizes(grid, prices, sizes, offsets)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # add_formula_params(), in the same operation order
+        s = np.abs(price - midpoint[market])
+        S = ((v[market] - s) / v[market]) ** 2
+        per_100 = 1 / price * 100
+        size = size + per_100
+        Q = S * size
+
+        Q_sum = np.bincount(market, weights=np.where(np.isnan(Q), 0, Q), minlength=n_markets)
+        reward = (Q / Q_sum[market]) * rate[market] / 2 / size * per_100
+
+    best = np.full(n_markets, -np.inf)
+    np.fmax.at(best, market, reward)
+    best[np.isneginf(best)] = np.nan
+    best = np.round(best, 2)
+
+    # An empty book side made the pandas version fail and score 0
+    return np.where(np.diff(offsets) > 0, best, 0.0)
+
+
+def score_markets(rows, books):
+    """
+    Score every market: the vectorized equivalent of calling
+    process_row_with_book() on each row.
+
+    Args:
+        rows (list): sampling-markets rows
+        books (dict): {token: {'bids', 'asks'}} in REST order, as returned by
+            book_fetcher.get_books()
+
+    Returns:
+        list: Result dicts with the same keys as process_row_with_book()
+    """
+    rows = [row for row in rows if len(row.get('tokens') or []) == 2]
+    if not rows:
+        return []
+
+    token_books = [books[str(row['tokens'][0]['token_id'])] for row in rows]
+
+    bid_prices, bid_sizes, bid_offsets = flatten_levels([book['bids'] for book in token_books])
+    ask_prices, ask_sizes, ask_offsets = flatten_levels([book['asks'] for book in token_books])
+
+    tick = np.array([row['minimum_tick_size'] for row in rows], dtype=np.float64)
+    decimals = np.array([tick_decimals(row['minimum_tick_size']) for row in rows])
+    max_spread = np.array([row['rewards']['max_spread'] for row in rows], dtype=np.float64)
+    rate = np.array([reward_rate(row) for row in rows], dtype=np.float64)
+
+    best_bid = last_price(bid_prices, bid_offsets)
+    best_ask = last_price(ask_prices, ask_offsets)
+    midpoint = (best_bid + best_ask) / 2
+
+    bid_from, bid_to, ask_from, ask_to = bid_ask_ranges(best_bid, best_ask, midpoint, max_spread, tick)
+    v = round_like_python(max_spread / 100, 2)
+
+    bid_reward = side_rewards(bid_from, bid_to, midpoint, v, rate, tick, decimals, bid_prices, bid_sizes, bid_offsets)
+    ask_reward = side_rewards(ask_from, ask_to, midpoint, v, rate, tick, decimals, ask_prices, ask_sizes, ask_offsets)
+
+    with np.errstate(invalid='ignore'):
+        sm_reward = np.round((bid_reward + ask_reward) / 2, 2)
+        gm_reward = np.round((bid_reward * ask_reward) ** 0.5, 2)
+
+    results = []
+    for i, row in enumerate(rows):
+        results.append({
+            'question': row['question'],
+            'neg_risk': row['neg_risk'],
+            'neg_risk_market_id': row.get('neg_risk_market_id') or '',
+            'answer1': row['tokens'][0]['outcome'],
+            'answer2': row['tokens'][1]['outcome'],
+            'min_size': row['rewards']['min_size'],
+            'max_spread': row['rewards']['max_spread'],
+            'rewards_daily_rate': reward_rate(row),
+            'best_bid': float(best_bid[i]),
+            'best_ask': float(best_ask[i]),
+            'midpoint': float(midpoint[i]),
+            'tick_size': row['minimum_tick_size'],
+            'bid_reward_per_100': float(bid_reward[i]),
+            'ask_reward_per_100': float(ask_reward[i]),
+            'sm_reward_per_100': float(sm_reward[i]),
+            'gm_reward_per_100': float(gm_reward[i]),
+            'end_date_iso': row['end_date_iso'],
+            'market_slug': row['market_slug'],
+            'token1': row['tokens'][0]['token_id'],
+            'token2': row['tokens'][1]['token_id'],
+            'condition_id': row['condition_id'],
+        })
+
+    return results
+
+
+if __name__ == "__main__":
+    # Parity check against the per-row pandas implementation, plus timing
+    import random
+    import time
+
+    from src.updater.find_markets import book_levels_to_dfs, process_row_with_book
+
+    random.seed(7)
+    rows = []
+    books = {}
+    for i in range(2000):
+        tick = random.choice([0.01, 0.01, 0.001])
+        mid = round(random.uniform(0.05, 0.95), 2)
+        bids = sorted({round(mid - tick * random.randint(1, 60), 3) for _ in range(random.randint(0, 25))})
+        asks = sorted({round(mid + tick * random.randint(1, 60), 3) for _ in range(random.randint(0, 25))}, reverse=True)
+        bids = [p for p in bids if p > 0]
+        asks = [p for p in asks if p < 1]
+        token = str(10**20 + i)
+        books[token] = {
+            'bids': [{'price': str(p), 'size': str(random.randint(5, 5000))} for p in bids],
+            'asks': [{'price': str(p), 'size': str(random.randint(5, 5000))} for p in asks],
+        }
+        rows.append({
+            'question': f'q{i}', 'neg_risk': False, 'end_date_iso': '', 'market_slug': f's{i}', 'condition_id': f'c{i}',
+            'tokens': [{'outcome': 'Yes', 'token_id': token}, {'outcome': 'No', 'token_id': token + '1'}],
+            'rewards': {'min_size': 50, 'max_spread': random.choice([1.5, 3, 3.5, 4.5]),
+                        'rates': [{'asset_address': USDC_ADDRESS, 'rewards_daily_rate': random.choice([10, 25, 100, 400])}]},
+            'minimum_tick_size': tick,
+        })
+
+    start = time.perf_counter()
+    expected = []
+    for row in rows:
+        book = books[row['tokens'][0]['token_id']]
+        bids, asks = book_levels_to_dfs(book['bids'], book['asks'])
+        expected.append(process_row_with_book(row, bids, asks))
+    pandas_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = score_markets(rows, books)
+    numpy_time = time.perf_counter() - start
+
+    mismatches = 0
+    for old, new in zip(expected, actual):
+        for col in old:
+            a, b = old[col], new[col]
+            same = a == b or (isinstance(b, float) and np.isnan(a) and np.isnan(b))
+            if not same:
+                mismatches += 1
+                print(f"Mismatch in {old['question']} {col}: {a} vs {b}")
+
+    print(f"{len(rows)} markets: per-row pandas {pandas_time * 1000:.0f} ms, vectorized {numpy_time * 1000:.1f} ms")
+    print(f"{mismatches} mismatched values")
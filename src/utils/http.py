@@ -0,0 +1,279 @@
+import asyncio
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP layer for all REST calls. One keep-alive connection pool per
+# host so repeated calls skip the TCP and TLS handshakes, with tuned timeouts
+# and retries with jittered backoff.
+#
+# The async flavour uses httpx (with HTTP/2 when the h2 package is installed)
+# and falls back to the pooled requests sessions in a worker thread.
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 15)
+
+# Connections kept alive per host
+POOL_SIZE = 32
+
+# Retries for transient failures: connection errors, 429 and 5xx responses
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.3
+BACKOFF_JITTER = 0.3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401 - only needed for httpx HTTP/2 support
+    HTTP2_AVAILABLE = httpx is not None
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HostStats:
+    """
+    Request latency and pool utilization for one host.
+    """
+    __slots__ = ('requests', 'errors', 'retries', 'total_latency', 'max_latency', 'in_flight', 'peak_in_flight')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+_sessions = {}
+_async_client = None
+_async_client_loop = None
+_lock = threading.Lock()
+
+# Whether the async fallback (no httpx, or no HTTP/2) has been logged
+_fallback_logged = False
+
+
+def _log_async_fallback():
+    global _fallback_logged
+    if _fallback_logged or HTTP2_AVAILABLE:
+        return
+    _fallback_logged = True
+    if httpx is None:
+        print("httpx is not installed: async requests run on the pooled sessions in worker threads")
+    else:
+        print("h2 is not installed: async requests use HTTP/1.1 (pip install 'httpx[http2]')")
+
+host_stats = {}
+
+
+def _host(url):
+    return urlsplit(url).netloc
+
+
+def _stats(host):
+    stats = host_stats.get(host)
+    if stats is None:
+        with _lock:
+            stats = host_stats.setdefault(host, HostStats())
+    return stats
+
+
+def get_session(host):
+    """
+    Get the pooled session for a host, creating it on first use.
+
+    Args:
+        host (str): Host name, e.g. "clob.polymarket.com"
+
+    Returns:
+        requests.Session: Session with a keep-alive pool and retries
+    """
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            retry = Retry(
+                total=MAX_RETRIES,
+                backoff_factor=BACKOFF_FACTOR,
+                backoff_jitter=BACKOFF_JITTER,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(['GET', 'HEAD']),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+
+    return session
+
+
+def request(method, url, **kwargs):
+    """
+    Make a request through the pooled session for the URL's host.
+    Takes the same arguments as requests.request.
+
+    Returns:
+        requests.Response
+    """
+    host = _host(url)
+    stats = _stats(host)
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+
+    with _lock:
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+
+    start = time.perf_counter()
+    try:
+        response = get_session(host).request(method, url, **kwargs)
+        retries = response.raw.retries
+        if retries is not None and retries.history:
+            stats.retries += len(retries.history)
+        return response
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        latency = time.perf_counter() - start
+        with _lock:
+            stats.in_flight -= 1
+            stats.requests += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def _get_async_client():
+    global _async_client, _async_client_loop
+
+    # httpx clients are bound to the loop they were first used on, and
+    # asyncio.run() starts a fresh loop each time. Entry points close the
+    # client with close_async_client() before their loop ends.
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        if _async_client is not None:
+            print("Warning: async HTTP client from a previous event loop was not closed")
+        _async_client_loop = loop
+        limits = httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        timeout = httpx.Timeout(DEFAULT_TIMEOUT[1], connect=DEFAULT_TIMEOUT[0])
+        _async_client = httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=timeout)
+
+    return _async_client
+
+
+async def close_async_client():
+    """
+    Close the pooled async client and its connections. Await it at the end
+    of every asyncio.run() that made async requests.
+    """
+    global _async_client, _async_client_loop
+
+    client = _async_client
+    _async_client = None
+    _async_client_loop = None
+    if client is not None:
+        await client.aclose()
+
+
+async def async_request(method, url, retry=None, **kwargs):
+    """
+    Async version of request(). Uses httpx when installed, otherwise runs the
+    pooled requests session in a worker thread.
+
+    Args:
+        retry (bool, optional): Retry transient failures. Defaults to True for
+            GET and False for other methods.
+
+    Returns:
+        httpx.Response or requests.Response - both expose status_code, json()
+        and raise_for_status()
+    """
+    _log_async_fallback()
+    if httpx is None:
+        return await asyncio.to_thread(request, method, url, **kwargs)
+
+    if retry is None:
+        retry = method in ('GET', 'HEAD')
+
+    host = _host(url)
+    stats = _stats(host)
+    client = _get_async_client()
+    attempts = MAX_RETRIES + 1 if retry else 1
+
+    for attempt in range(attempts):
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        start = time.perf_counter()
+
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            stats.errors += 1
+            if attempt == attempts - 1:
+                raise
+            response = None
+        finally:
+            latency = time.perf_counter() - start
+            stats.in_flight -= 1
+            stats.requests += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+
+        if response is not None and (response.status_code not in RETRY_STATUSES or attempt == attempts - 1):
+            return response
+
+        stats.retries += 1
+        delay = BACKOFF_FACTOR * (2 ** attempt) + random.uniform(0, BACKOFF_JITTER)
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            delay = max(delay, int(response.headers['Retry-After']))
+        await asyncio.sleep(delay)
+
+
+async def async_get(url, **kwargs):
+    return await async_request('GET', url, **kwargs)
+
+
+async def async_post(url, **kwargs):
+    return await async_request('POST', url, **kwargs)
+
+
+def print_http_stats():
+    """
+    Print per-host request counts, latency and peak pool utilization.
+    """
+    with _lock:
+        rows = sorted(host_stats.items())
+
+    if not rows:
+        return
+
+    print(f"\n{'host':<32}{'requests':>9}{'errors':>8}{'retries':>8}{'avg ms':>9}{'max ms':>9}{'peak pool':>11}")
+    for host, stats in rows:
+        avg_ms = stats.total_latency / stats.requests * 1000 if stats.requests else 0
+        print(f"{host:<32}{stats.requests:>9}{stats.errors:>8}{stats.retries:>8}{avg_ms:>9.1f}"
+              f"{stats.max_latency * 1000:>9.1f}{stats.peak_in_flight:>6}/{POOL_SIZE}")
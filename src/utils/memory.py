@@ -0,0 +1,130 @@
+import gc
+import sys
+import time
+
+import src.core.global_state as global_state
+
+# Memory diagnostics for `main.py --memory-report`: the process's resident
+# memory and the deep size of each long-lived structure, so growth can be
+# traced to the structure that holds it.
+
+# Seconds between reports
+REPORT_INTERVAL = 60
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Approximate memory held by an object and everything it references
+    through containers, sorted containers and __slots__ records. Other
+    objects (locks, timers' callbacks) are counted shallowly, so the walk
+    never wanders into the event loop or module globals.
+
+    Args:
+        obj: Object to measure
+        seen (set): ids already counted. Share it across calls so objects
+            referenced from several structures are counted once.
+
+    Returns:
+        int: Size in bytes
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+
+        size += sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+
+        slots = getattr(type(obj), '__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if hasattr(obj, name):
+                stack.append(getattr(obj, name))
+
+        if hasattr(obj, '__dict__'):
+            if type(obj).__module__.startswith('sortedcontainers'):
+                # A SortedDict keeps its keys again in an internal SortedList
+                stack.append(obj.__dict__)
+            else:
+                size += sys.getsizeof(obj.__dict__, 0)
+
+    return size
+
+
+def resident_memory():
+    """
+    Resident set size of this process in bytes, or None where /proc isn't
+    available.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def tracked_structures():
+    # Imported when a report is printed, so importing this module stays light
+    from src.trading.trading import market_locks
+    from src.data.live_volatility import estimators
+    from src.data.market_lifecycle import timers
+
+    return [
+        ('all_data (books)', global_state.all_data),
+        ('markets', global_state.markets),
+        ('df', global_state.df),
+        ('REVERSE_TOKENS', global_state.REVERSE_TOKENS),
+        ('all_tokens', global_state.all_tokens),
+        ('all_tokens_set', global_state.all_tokens_set),
+        ('positions', global_state.positions),
+        ('orders', global_state.orders),
+        ('performing', global_state.performing),
+        ('performing_timestamps', global_state.performing_timestamps),
+        ('last_trade_update', global_state.last_trade_update),
+        ('market_locks', market_locks),
+        ('live volatility', estimators),
+        ('lifecycle timers', timers),
+    ]
+
+
+def print_memory_report():
+    """
+    Print resident memory and a per-structure breakdown. Must run on the
+    event loop, which is the only writer of these structures.
+    """
+    start = time.perf_counter()
+    seen = set()
+    rows = []
+    for name, structure in tracked_structures():
+        if structure is None:
+            size = 0
+        elif hasattr(structure, 'memory_usage'):
+            size = int(structure.memory_usage(deep=True).sum())
+        else:
+            size = deep_sizeof(structure, seen)
+        rows.append((name, len(structure) if structure is not None else 0, size))
+
+    rss = resident_memory()
+    counts = gc.get_count()
+
+    print("\n===== Memory report =====")
+    print(f"resident: {rss / 2**20:.1f} MB" if rss is not None else "resident: unavailable")
+    print(f"{'structure':<24}{'entries':>9}{'size':>12}")
+    for name, entries, size in rows:
+        print(f"{name:<24}{entries:>9}{size / 2**20:>10.2f}MB")
+    print(f"{'total tracked':<24}{'':>9}{sum(size for _, _, size in rows) / 2**20:>10.2f}MB")
+    print(f"gc: {gc.get_freeze_count()} frozen objects, pending counts {counts}, "
+          f"report took {(time.perf_counter() - start) * 1000:.0f} ms")
+    print("=========================\n")
@@ -0,0 +1,65 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Lightweight startup timing. Steps are always recorded (it costs a few
+# microseconds each) and the report is printed with `main.py --profile-startup`.
+
+process_start = time.perf_counter()
+
+# (name, start offset, duration, thread name)
+timings = []
+
+# (name, offset) milestones such as "first market message"
+milestones = []
+reached_names = set()
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def timed(name):
+    """
+    Time a startup step. Works from the event loop and from worker threads.
+
+    Args:
+        name (str): Step name shown in the report
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        with _lock:
+            timings.append((name, start - process_start, end - start, threading.current_thread().name))
+
+
+def mark(name):
+    """
+    Record a milestone the first time it is reached. Cheap enough to call on
+    every websocket message.
+    """
+    if name in reached_names:
+        return
+
+    with _lock:
+        if name not in reached_names:
+            reached_names.add(name)
+            milestones.append((name, time.perf_counter() - process_start))
+
+
+def print_startup_report():
+    with _lock:
+        steps = sorted(timings, key=lambda step: step[1])
+        reached = sorted(milestones, key=lambda milestone: milestone[1])
+
+    print("\n===== Startup profile =====")
+    print(f"{'step':<36}{'start':>9}{'took':>9}  thread")
+    for name, start, duration, thread in steps:
+        print(f"{name:<36}{start:>8.2f}s{duration:>8.2f}s  {thread}")
+
+    if reached:
+        print(f"\n{'milestone':<36}{'at':>9}")
+        for name, offset in reached:
+            print(f"{name:<36}{offset:>8.2f}s")
+    print("===========================\n")
@@ -0,0 +1,185 @@
+import json
+import os
+
+import pandas as pd
+
+from src.utils.utils import CONFIG_DIR, atomic_write, load_json, save_to_json
+
+# Compact market output files with an embedded index.
+#
+# <name>.ndjson starts with the column names, then holds one record per line
+# as a compact JSON array of values, then an index line mapping each condition
+# ID and token ID to its record's byte offset, then a fixed-width footer line
+# with the index line's offset:
+#
+#   {"_columns": ["question", ..., "token1", ..., "condition_id"]}
+#   ["Will ...?", ..., "1234...", ..., "0xabc..."]
+#   ...
+#   {"_index": {"condition_id": {id: offset}, "token": {id: offset}}, "count": n}
+#   {"_index_offset": 123456}           <- padded to FOOTER_SIZE bytes
+#
+# Every line is valid JSON. A reader seeks to the footer, loads the index
+# once per file version, and then reads a single market with one seek.
+# Records that lack a column get null for it.
+# Files are replaced atomically, so readers never see a partial write.
+
+FOOTER_SIZE = 64
+
+# Index name -> record fields indexed under it
+INDEX_FIELDS = {
+    'condition_id': ('condition_id',),
+    'token': ('token1', 'token2'),
+}
+
+# path -> ((inode, mtime_ns, size), columns, index, index_offset)
+_index_cache = {}
+
+
+def _records_path(name):
+    return os.path.join(CONFIG_DIR, name + '.ndjson')
+
+
+def _to_records(data):
+    if isinstance(data, pd.DataFrame):
+        return data.to_dict(orient='records')
+    return data
+
+
+def write_records(data, name):
+    """
+    Write records to config/<name>.ndjson with an index by condition and
+    token ID.
+
+    Args:
+        data (DataFrame or list): Records to save
+        name (str): File name without extension
+    """
+    records = _to_records(data)
+    index = {key: {} for key in INDEX_FIELDS}
+
+    columns = list(dict.fromkeys(column for record in records for column in record))
+    header = (json.dumps({'_columns': columns}, separators=(',', ':')) + '\n').encode()
+
+    lines = [header]
+    offset = len(header)
+    for record in records:
+        values = [record.get(column) for column in columns]
+        line = (json.dumps(values, separators=(',', ':'), default=str) + '\n').encode()
+        for key, fields in INDEX_FIELDS.items():
+            for field in fields:
+                value = record.get(field)
+                if value is not None and value != '':
+                    index[key].setdefault(str(value), offset)
+        lines.append(line)
+        offset += len(line)
+
+    index_line = (json.dumps({'_index': index, 'count': len(records)}, separators=(',', ':')) + '\n').encode()
+    footer = json.dumps({'_index_offset': offset}).encode().ljust(FOOTER_SIZE - 1) + b'\n'
+
+    def write(f):
+        f.writelines(lines)
+        f.write(index_line)
+        f.write(footer)
+
+    filepath = _records_path(name)
+    atomic_write(filepath, write, mode='wb')
+    print(f"Saved {len(records)} records to {filepath}")
+
+
+def save_records(data, name, json_export=False):
+    """
+    Save output records as NDJSON, optionally with a <name>.json copy for
+    people to read and edit.
+    """
+    records = _to_records(data)
+    write_records(records, name)
+    if json_export:
+        save_to_json(records, name + '.json')
+
+
+def _load_index(f):
+    # Keyed on the open file's version, so a file replaced between the index
+    # load and the record read can't mix offsets from two versions
+    stat = os.fstat(f.fileno())
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    cached = _index_cache.get(f.name)
+    if cached is not None and cached[0] == version:
+        return cached[1:]
+
+    f.seek(0)
+    columns = json.loads(f.readline())['_columns']
+    f.seek(-FOOTER_SIZE, os.SEEK_END)
+    index_offset = json.loads(f.read())['_index_offset']
+    f.seek(index_offset)
+    payload = json.loads(f.readline())
+
+    entry = (version, columns, payload['_index'], index_offset)
+    _index_cache[f.name] = entry
+    return entry[1:]
+
+
+def read_record(name, key, by='token'):
+    """
+    Read one record without parsing the rest of the file.
+
+    Args:
+        name (str): File name without extension
+        key (str): Token ID or condition ID
+        by (str): 'token' or 'condition_id'
+
+    Returns:
+        dict or None: The record, or None if the key or file doesn't exist
+    """
+    try:
+        f = open(_records_path(name), 'rb')
+    except FileNotFoundError:
+        return None
+
+    with f:
+        columns, index, _ = _load_index(f)
+        offset = index[by].get(str(key))
+        if offset is None:
+            return None
+
+        f.seek(offset)
+        return dict(zip(columns, json.loads(f.readline())))
+
+
+def read_records(name, columns=None):
+    """
+    Read all records, falling back to <name>.json when there is no NDJSON
+    file yet.
+
+    Args:
+        name (str): File name without extension
+        columns (list): Only keep these fields
+
+    Returns:
+        list: Records
+    """
+    try:
+        f = open(_records_path(name), 'rb')
+    except FileNotFoundError:
+        data = load_json(name + '.json')
+        records = data if isinstance(data, list) else []
+    else:
+        with f:
+            names, _, index_offset = _load_index(f)
+            f.seek(0)
+            f.readline()
+
+            if columns is None:
+                keep = list(enumerate(names))
+            else:
+                keep = [(names.index(column), column) for column in columns if column in names]
+
+            records = []
+            while f.tell() < index_offset:
+                values = json.loads(f.readline())
+                records.append({column: values[i] for i, column in keep})
+            return records
+
+    if columns is not None:
+        records = [{column: record.get(column) for column in columns} for record in records]
+    return records
@@ -1,6 +1,7 @@
 import json
 import pandas as pd
 import os
+import tempfile
 
 # Config directory - relative to project root
 CONFIG_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'config')
@@ -27,6 +28,32 @@ def load_json(filename):
     return []
 
 
+def atomic_write(filepath, write, mode='w'):
+    """
+    Write a file via a temporary file in the same directory and a rename, so
+    readers see either the old or the new content, never a partial file.
+
+    Args:
+        filepath (str): Destination path
+        write (callable): Called with the open temporary file
+        mode (str): 'w' for text, 'wb' for bytes
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(filepath) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file owner-only; keep the old file's permissions
+        os.chmod(tmp_path, os.stat(filepath).st_mode & 0o777 if os.path.exists(filepath) else 0o644)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def save_to_json(data, filename):
     """
     Save data to JSON file in config directory.
@@ -41,8 +68,7 @@ def save_to_json(data, filename):
     else:
         records = data
     
-    with open(filepath, 'w') as f:
-        json.dump(records, f, indent=2)
+    atomic_write(filepath, lambda f: json.dump(records, f, indent=2))
     print(f"Saved {len(records)} records to {filepath}")
 
 
@@ -3,11 +3,13 @@ Crypto Markets Updater
 Fetches active crypto up/down markets (15m, hourly, daily) and saves to crypto_markets.json
 """
 
-import requests
 import time
 import datetime
 import pytz
 from src.utils.utils import save_to_json
+from src.utils.http import print_http_stats
+from src.updater.book_fetcher import get_books
+from src.updater.crypto_discovery import discover_events, parse_json_list
 
 GAMMA_API = "https://gamma-api.polymarket.com"
 CLOB_API = "https://clob.polymarket.com"
@@ -76,11 +78,9 @@ def generate_15m_slug(asset, target_time):
 
 
 def get_orderbook(token_id):
-    """Get best bid/ask from CLOB orderbook"""
+    """Get best bid/ask from CLOB orderbook (served from the bulk book cache after prefetch_books)"""
     try:
-        r = requests.get(f"{CLOB_API}/book", params={'token_id': token_id})
-        r.raise_for_status()
-        data = r.json()
+        data = get_books([token_id])[str(token_id)]
         
         bids = data.get('bids', [])
         asks = data.get('asks', [])
@@ -93,6 +93,34 @@ def get_orderbook(token_id):
         return 0, 0
 
 
+def parse_market_tokens(market):
+    """Parse a Gamma market's token IDs and outcomes"""
+    clob_token_ids = parse_json_list(market.get('clobTokenIds', '[]'))
+    outcomes = parse_json_list(market.get('outcomes', '[]'))
+    return clob_token_ids, outcomes
+
+
+def prefetch_books(events):
+    """Fetch the books every event will need in bulk requests"""
+    tokens = []
+    for event in events:
+        for market in event.get('markets', []):
+            if not market.get('active') or market.get('closed'):
+                continue
+            try:
+                clob_token_ids, outcomes = parse_market_tokens(market)
+            except Exception:
+                continue
+            if len(clob_token_ids) == 2:
+                tokens.append(clob_token_ids[0])
+
+    try:
+        get_books(tokens)
+    except Exception as e:
+        # get_orderbook will retry per market
+        print(f"  Bulk book fetch failed: {e}")
+
+
 def process_event(event):
     """Process a single event into market data"""
     markets_data = []
@@ -103,8 +131,7 @@ def process_event(event):
             
         try:
             # Parse token IDs
-            clob_token_ids = eval(market.get('clobTokenIds', '[]'))
-            outcomes = eval(market.get('outcomes', '[]'))
+            clob_token_ids, outcomes = parse_market_tokens(market)
             
             if len(clob_token_ids) != 2 or len(outcomes) != 2:
                 continue
@@ -112,9 +139,8 @@ def process_event(event):
             token1, token2 = clob_token_ids
             answer1, answer2 = outcomes
             
-            # Get orderbook data
+            # Get orderbook data. Only the first token's book is used.
             best_bid_1, best_ask_1 = get_orderbook(token1)
-            best_bid_2, best_ask_2 = get_orderbook(token2)
             
             # Use the first token's orderbook for primary pricing
             best_bid = best_bid_1
@@ -175,85 +201,67 @@ def process_event(event):
     return markets_data
 
 
-def fetch_event_by_slug(slug):
-    """Fetch a single event by its slug"""
-    try:
-        r = requests.get(f"{GAMMA_API}/events", params={'slug': slug})
-        r.raise_for_status()
-        data = r.json()
-        return data[0] if data else None
-    except Exception as e:
-        return None
-
+def generate_candidates(now):
+    """
+    Slugs for every upcoming window, as (slug, recurrence, window_end) with
+    window_end in unix seconds.
+    """
+    candidates = []
 
-def update_crypto_markets():
-    """Main function to update crypto markets by generating slugs for upcoming events"""
-    print(f"\n{datetime.datetime.now(pytz.utc)}: Starting crypto markets update...")
-    
-    all_markets = []
-    now = datetime.datetime.now(pytz.utc)
-    
-    # Generate slugs for hourly markets (next 24 hours)
-    print("  Fetching hourly markets...")
+    # Hourly markets (next 24 hours)
     for asset in ['bitcoin', 'solana', 'xrp']:
         for hours_ahead in range(0, 24):
             target_time = now + datetime.timedelta(hours=hours_ahead)
             # Round to the hour
             target_time = target_time.replace(minute=0, second=0, microsecond=0)
-            
-            slug = generate_hourly_slug(asset, target_time)
-            event = fetch_event_by_slug(slug)
-            
-            if event:
-                markets = process_event(event)
-                for m in markets:
-                    m['recurrence'] = 'hourly'
-                all_markets.extend(markets)
-            
-            time.sleep(0.1)  # Rate limiting
-    
-    print(f"    Found {len([m for m in all_markets if m.get('recurrence') == 'hourly'])} hourly markets")
-    
-    # Generate slugs for 15m markets (next 6 hours) 
-    print("  Fetching 15m markets...")
+            window_end = target_time + datetime.timedelta(hours=1)
+            candidates.append((generate_hourly_slug(asset, target_time), 'hourly', window_end.timestamp()))
+
+    # 15m markets (next 6 hours)
     for asset in ['xrp', 'eth', 'sol']:
         for minutes_ahead in range(0, 360, 15):  # Every 15 min for 6 hours
             target_time = now + datetime.timedelta(minutes=minutes_ahead)
             # Round to nearest 15 minutes
             minute = (target_time.minute // 15) * 15
             target_time = target_time.replace(minute=minute, second=0, microsecond=0)
-            
-            slug = generate_15m_slug(asset, target_time)
-            event = fetch_event_by_slug(slug)
-            
-            if event:
-                markets = process_event(event)
-                for m in markets:
-                    m['recurrence'] = '15m'
-                all_markets.extend(markets)
-            
-            time.sleep(0.1)
-    
-    print(f"    Found {len([m for m in all_markets if m.get('recurrence') == '15m'])} 15m markets")
-    
-    # Generate slugs for daily markets (next 7 days)
-    print("  Fetching daily markets...")
+            window_end = target_time + datetime.timedelta(minutes=15)
+            candidates.append((generate_15m_slug(asset, target_time), '15m', window_end.timestamp()))
+
+    # Daily markets (next 7 days)
+    et_tz = pytz.timezone('US/Eastern')
     for asset in ['xrp', 'dogecoin']:
         for days_ahead in range(0, 7):
             target_date = now + datetime.timedelta(days=days_ahead)
-            
-            slug = generate_daily_slug(asset, target_date)
-            event = fetch_event_by_slug(slug)
-            
-            if event:
-                markets = process_event(event)
-                for m in markets:
-                    m['recurrence'] = 'daily'
-                all_markets.extend(markets)
-            
-            time.sleep(0.1)
+            # Open until the end of the day in ET at the latest
+            day = target_date.astimezone(et_tz).date() + datetime.timedelta(days=1)
+            window_end = et_tz.localize(datetime.datetime(day.year, day.month, day.day))
+            candidates.append((generate_daily_slug(asset, target_date), 'daily', window_end.timestamp()))
+
+    return candidates
+
+
+def update_crypto_markets():
+    """Main function to update crypto markets by generating slugs for upcoming events"""
+    print(f"\n{datetime.datetime.now(pytz.utc)}: Starting crypto markets update...")
+    
+    now = datetime.datetime.now(pytz.utc)
+    
+    # Slugs are looked up concurrently; known events and recent misses come
+    # from the slug cache
+    events = discover_events(generate_candidates(now))
+    
+    # Books for every event in a few bulk requests, then build the markets
+    prefetch_books([event for event, _ in events])
+    
+    all_markets = []
+    for event, recurrence in events:
+        markets = process_event(event)
+        for m in markets:
+            m['recurrence'] = recurrence
+        all_markets.extend(markets)
     
-    print(f"    Found {len([m for m in all_markets if m.get('recurrence') == 'daily'])} daily markets")
+    for tf in ['hourly', '15m', 'daily']:
+        print(f"    Found {len([m for m in all_markets if m.get('recurrence') == tf])} {tf} markets")
     
     # Remove duplicates by condition_id
     seen = set()
@@ -291,6 +299,7 @@ if __name__ == "__main__":
     while True:
         try:
             update_crypto_markets()
+            print_http_stats()
         except Exception as e:
             print(f"Error in update loop: {e}")
         
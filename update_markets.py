@@ -2,13 +2,14 @@ import time
 import pandas as pd
 import json
 import os
-from src.updater.updater_utils import get_clob_client
-from src.updater.find_markets import get_all_markets, get_all_results, get_markets, add_volatility_to_df
-from src.utils.utils import load_json, save_to_json
+from src.updater.find_markets import get_markets
+from src.updater.async_scanner import run_scan
+from src.updater.continuous_scanner import run_continuous
+from src.utils.utils import load_json
+from src.utils.records import save_records
+from src.utils.http import print_http_stats
 import traceback
-
-# Initialize client
-client = get_clob_client()
+import sys
 
 
 def load_selected_markets():
@@ -58,21 +59,39 @@ def sort_df(df):
     
     return sorted_df
 
+# Minimum gm_reward_per_100 for a market outside markets.json to be listed
+MAKER_REWARD = 0.75
+
+def load_selected_questions():
+    sel_df = load_selected_markets()
+    return set(sel_df['question']) if len(sel_df) > 0 else set()
+
 def fetch_and_process_data():
-    global client
-    
-    client = get_clob_client()
     sel_df = load_selected_markets()
 
-    all_df = get_all_markets(client)
-    print("Got all Markets")
-    all_results = get_all_results(all_df, client)
+    # Books and price histories are fetched as market pages arrive
+    all_results, volatility = run_scan(sel_df, maker_reward=MAKER_REWARD)
     print("Got all Results")
-    m_data, all_markets = get_markets(all_results, sel_df, maker_reward=0.75)
+    publish_results(all_results, volatility, sel_df)
+
+def publish_results(all_results, volatility, sel_df=None):
+    """
+    Rank scored markets and write all_markets.json, volatility_markets.json
+    and full_markets.json.
+
+    Args:
+        all_results (list): Reward rows for every market
+        volatility (dict): {token1: row with volatility figures}
+        sel_df (DataFrame): Markets from markets.json, re-read if not given
+    """
+    if sel_df is None:
+        sel_df = load_selected_markets()
+
+    m_data, all_markets = get_markets(all_results, sel_df, maker_reward=MAKER_REWARD)
     print("Got all orderbook")
 
     print(f'{pd.to_datetime("now")}: Fetched all markets data of length {len(all_markets)}.')
-    new_df = add_volatility_to_df(all_markets)
+    new_df = pd.DataFrame([{**volatility[row['token1']], **row} for row in all_markets.to_dict('records') if row['token1'] in volatility])
     new_df['volatility_sum'] =  new_df['24_hour'] + new_df['7_day'] + new_df['14_day']
     
     new_df = new_df.sort_values('volatility_sum', ascending=True)
@@ -80,7 +99,7 @@ def fetch_and_process_data():
 
     new_df = new_df[['question', 'answer1', 'answer2', 'spread', 'rewards_daily_rate', 'gm_reward_per_100', 'sm_reward_per_100', 'bid_reward_per_100', 'ask_reward_per_100',  'volatility_sum', 'volatilty/reward', 'min_size', '1_hour', '3_hour', '6_hour', '12_hour', '24_hour', '7_day', '30_day',  
                      'best_bid', 'best_ask', 'volatility_price', 'max_spread', 'tick_size',  
-                     'neg_risk',  'market_slug', 'token1', 'token2', 'condition_id']]
+                     'neg_risk', 'neg_risk_market_id', 'market_slug', 'token1', 'token2', 'condition_id']]
 
     # Add default trading parameters so markets can be copied directly to markets.json
     new_df['trade_size'] = 25
@@ -99,18 +118,28 @@ def fetch_and_process_data():
     print(f'{pd.to_datetime("now")}: Fetched select market of length {len(new_df)}.')
 
     if len(new_df) > 50:
-        # Save to JSON files instead of Google Sheets
-        save_to_json(new_df, 'all_markets.json')
-        save_to_json(volatility_df, 'volatility_markets.json')
-        save_to_json(m_data, 'full_markets.json')
+        # Indexed NDJSON for readers, plus JSON copies of the rankings for
+        # picking markets into markets.json
+        save_records(new_df, 'all_markets', json_export=True)
+        save_records(volatility_df, 'volatility_markets', json_export=True)
+        save_records(m_data, 'full_markets')
     else:
         print(f'{pd.to_datetime("now")}: Not saving because of length {len(new_df)}.')
 
-if __name__ == "__main__":
+def run_hourly():
     while True:
         try:
             fetch_and_process_data()
+            print_http_stats()
             time.sleep(60 * 60)  # Sleep for an hour
         except Exception as e:
             traceback.print_exc()
             print(str(e))
+
+if __name__ == "__main__":
+    if '--hourly' in sys.argv:
+        # Full rescan every hour
+        run_hourly()
+    else:
+        # Keep per-market state and refresh only what is stale
+        run_continuous(load_selected_questions, publish_results, MAKER_REWARD)